@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+# Tailles d'assemblée synthétique mesurées par défaut
+SCALES = {
+    'small': {'n_deputes': 150, 'n_scrutins': 300, 'n_groups': 6},
+    'medium': {'n_deputes': 577, 'n_scrutins': 1000, 'n_groups': 8},
+    'large': {'n_deputes': 650, 'n_scrutins': 4000, 'n_groups': 10},
+}
+
+STAGES = ['build_dataset', 'filter_by_voters', 'vote_matrix', 'similarity_cosine', 'similarity_correlation',
+          'similarity_jaccard', 'similarity_agreement_weighted', 'generate_graph', 'compute_graph_metrics']
+
+
+def synthetic_assembly(n_deputes=577, n_scrutins=1000, n_groups=8, discipline=0.9, absence=0.3,
+                       non_votant=0.01, seed=0):
+    """
+    Génère des votes d'assemblée fictive au format du CSV (depute, groupe,
+    position, scrutin_id).
+
+    Chaque groupe a une consigne par scrutin (pour / contre / abstention) ; un
+    député la suit avec la probabilité `discipline` et vote au hasard sinon.
+    Le taux d'absence varie d'un député à l'autre autour de `absence`, et une
+    fraction `non_votant` des présents est non-votante.
+    """
+    rng = np.random.default_rng(seed)
+    positions = np.array(['pour', 'contre', 'abstention', 'nonVotant'])
+
+    # Groupes de tailles inégales, comme dans l'hémicycle
+    sizes = rng.dirichlet(np.full(n_groups, 2.0))
+    groups = rng.choice(n_groups, size=n_deputes, p=sizes)
+    consignes = rng.choice(3, size=(n_groups, n_scrutins), p=[0.45, 0.45, 0.10])
+
+    follows = rng.random((n_deputes, n_scrutins)) < discipline
+    codes = np.where(follows, consignes[groups], rng.choice(3, size=(n_deputes, n_scrutins)))
+    codes[rng.random((n_deputes, n_scrutins)) < non_votant] = 3
+
+    absence_rate = np.clip(rng.beta(2, 2, size=n_deputes) * 2 * absence, 0, 0.98)
+    present = rng.random((n_deputes, n_scrutins)) >= absence_rate[:, None]
+
+    rows, cols = np.nonzero(present.T)  # ordre scrutin par scrutin, comme le CSV téléchargé
+    return pd.DataFrame({
+        'depute': np.char.add('depute-', cols.astype(str)),
+        'groupe': np.char.add('GRP', groups[cols].astype(str)),
+        'position': positions[codes[cols, rows]],
+        'scrutin_id': rows + 1,
+    })
+
+
+def write_an_xml(df, out_dir):
+    """
+    Écrit les votes `df` au format des exports de l'Assemblée nationale lus par
+    `convert.build_dataset` : `scrutins.xml` (décomptes nominatifs par groupe)
+    et `table_noms.xml` (organes et acteurs). Retourne les deux chemins.
+
+    Les non-votants ne sont pas écrits : `convert` ne lit que les pour, contre
+    et abstentions des décomptes nominatifs, et le CSV produit ne contient donc
+    que les lignes de `df` exprimées.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    df = df[df['position'] != 'nonVotant']
+    deputes = pd.Index(df['depute'].unique())
+    groupes = pd.Index(df['groupe'].unique())
+    acteur = {d: f"PA{i + 1}" for i, d in enumerate(deputes)}
+    organe = {g: f"PO{i + 1}" for i, g in enumerate(groupes)}
+
+    noms_path = os.path.join(out_dir, 'table_noms.xml')
+    with open(noms_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<export xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">\n<organes>\n')
+        for g, uid in organe.items():
+            f.write(f'<organe xsi:type="GroupePolitique_type"><uid>{uid}</uid>'
+                    f'<libelleAbrege>{escape(g)}</libelleAbrege></organe>\n')
+        f.write('</organes>\n<acteurs>\n')
+        for d, uid in acteur.items():
+            prenom, _, nom = d.partition('-')
+            f.write(f'<acteur><uid>{uid}</uid><etatCivil><ident><prenom>{escape(prenom)}</prenom>'
+                    f'<nom>{escape(nom)}</nom></ident></etatCivil></acteur>\n')
+        f.write('</acteurs>\n</export>\n')
+
+    tags = {'pour': 'pours', 'contre': 'contres', 'abstention': 'abstentions'}
+    scrutins_path = os.path.join(out_dir, 'scrutins.xml')
+    with open(scrutins_path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<scrutins>\n')
+        for scrutin_id, votes in df.groupby('scrutin_id', sort=True):
+            f.write(f'<scrutin><numero>{scrutin_id}</numero><ventilationVotes><organe><groupes>\n')
+            for groupe, members in votes.groupby('groupe', sort=False):
+                f.write(f'<groupe><organeRef>{organe[groupe]}</organeRef><vote><decompteNominatif>')
+                for position, voters in members.groupby('position', sort=False):
+                    refs = ''.join(f'<votant><acteurRef>{acteur[d]}</acteurRef></votant>'
+                                   for d in voters['depute'])
+                    f.write(f'<{tags[position]}>{refs}</{tags[position]}>')
+                f.write('</decompteNominatif></vote></groupe>\n')
+            f.write('</groupes></organe></ventilationVotes></scrutin>\n')
+        f.write('</scrutins>\n')
+
+    return scrutins_path, noms_path
+
+
+def measure(func, *args, **kwargs):
+    """
+    Exécute `func` et retourne (résultat, durée murale en s, temps CPU en s,
+    pic mémoire Python/numpy en Mo, mesuré par `tracemalloc`).
+    """
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        result = func(*args, **kwargs)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, wall, cpu, peak / 1e6
+
+
+def run_scale(name, params, stages=None, discipline=0.9, absence=0.3, seed=0, workdir=None):
+    """Mesure chaque étape du pipeline sur une assemblée synthétique ; retourne une ligne par étape."""
+    from src.convert import build_dataset
+    from src.graph import generate_graph
+    from src.properties import compute_graph_metrics
+    from src.similarity import compute_similarity, filter_by_voters
+    from src.votes import VoteMatrix
+
+    stages = stages or STAGES
+    df = synthetic_assembly(discipline=discipline, absence=absence, seed=seed, **params)
+    rows = []
+
+    def record(stage, func, *args, **kwargs):
+        result, wall, cpu, peak = measure(func, *args, **kwargs)
+        rows.append({'scale': name, **params, 'stage': stage, 'wall_s': round(wall, 4),
+                     'cpu_s': round(cpu, 4), 'peak_mb': round(peak, 2)})
+        print(f"[{name}] {stage:<30} {wall:8.3f} s  {peak:9.1f} Mo")
+        return result
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        if 'build_dataset' in stages:
+            scrutins_path, noms_path = write_an_xml(df, os.path.join(tmp, 'xml'))
+            csv_path = os.path.join(tmp, 'out', 'votes.csv')
+            record('build_dataset', build_dataset, scrutins_path, noms_path, csv_path)
+            expected = (df['position'] != 'nonVotant').sum()
+            with open(csv_path, encoding='utf-8') as f:
+                converted = sum(1 for _ in f) - 1
+            assert converted == expected, f"build_dataset : {converted} lignes converties, {expected} attendues"
+        if 'filter_by_voters' in stages:
+            record('filter_by_voters', filter_by_voters, df, params['n_deputes'] // 10)
+
+        votes = record('vote_matrix', lambda: VoteMatrix.from_long(df).drop_unvoted())
+        meta = votes.meta()
+
+        sim = None
+        for method in ('cosine', 'correlation', 'jaccard', 'agreement_weighted'):
+            if f'similarity_{method}' in stages:
+                result = record(f'similarity_{method}', compute_similarity, votes, method=method)
+                sim = result if method == 'cosine' else sim
+        if sim is None and ('generate_graph' in stages or 'compute_graph_metrics' in stages):
+            sim = compute_similarity(votes)
+
+        G = None
+        if 'generate_graph' in stages:
+            G = record('generate_graph', generate_graph, sim, meta, 0, 5, 0,
+                       output_path=os.path.join(tmp, 'network.png'))
+        if 'compute_graph_metrics' in stages:
+            if G is None:
+                from src.graph import build_knn_graph
+                G = build_knn_graph(sim, 5)
+            record('compute_graph_metrics', compute_graph_metrics, G, meta, top_n=10)
+
+    return rows
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    """Affiche le rapport de durée de chaque étape par rapport à un fichier de référence."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['scale'], r['stage']): r for r in json.load(f)['results']}
+    print(f"\nComparaison avec {baseline_path} :")
+    for row in current['results']:
+        ref = baseline.get((row['scale'], row['stage']))
+        if ref and ref['wall_s'] > 0:
+            print(f"[{row['scale']}] {row['stage']:<30} x{row['wall_s'] / ref['wall_s']:6.2f} temps  "
+                  f"x{row['peak_mb'] / max(ref['peak_mb'], 1e-9):6.2f} mémoire")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesures de performance du pipeline sur assemblées synthétiques.")
+    parser.add_argument("--scales", nargs="+", choices=sorted(SCALES), default=["small", "medium"])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=None)
+    parser.add_argument("--discipline", type=float, default=0.9)
+    parser.add_argument("--absence", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json", help="Fichier JSON des résultats.")
+    parser.add_argument("--compare", default=None, help="Résultats de référence (JSON) à comparer.")
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    results = []
+    for name in args.scales:
+        results += run_scale(name, SCALES[name], args.stages, discipline=args.discipline,
+                             absence=args.absence, seed=args.seed)
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'settings': {'discipline': args.discipline, 'absence': args.absence, 'seed': args.seed},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Résultats écrits dans {args.output}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main()
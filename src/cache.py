@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from src.config import CACHE_DIR
+
+
+def content_hash(*parts):
+    """
+    Empreinte stable d'un ensemble d'entrées : DataFrame / Series (valeurs,
+    index et colonnes), tableaux numpy, ou tout objet sérialisable en JSON
+    (paramètres). Deux appels avec les mêmes données donnent la même clé.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            digest.update(b'frame')
+            digest.update(pd.util.hash_pandas_object(part, index=True).values.tobytes())
+            if isinstance(part, pd.DataFrame):
+                digest.update(json.dumps([str(c) for c in part.columns]).encode('utf-8'))
+        elif isinstance(part, np.ndarray):
+            digest.update(b'array')
+            digest.update(str((part.dtype, part.shape)).encode('utf-8'))
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(b'json')
+            digest.update(json.dumps(part, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Cache d'artefacts adressé par contenu : chaque entrée est rangée sous
+    `root/<clé>/`, la clé étant l'empreinte des données d'entrée et des
+    paramètres qui l'ont produite (voir `content_hash`). Une entrée n'est
+    donc jamais invalidée : des entrées différentes donnent une autre clé.
+    """
+
+    def __init__(self, root=os.path.join(CACHE_DIR, "artifacts"), enabled=True):
+        self.root = root
+        self.enabled = enabled
+
+    def path(self, key, name):
+        return os.path.join(self.root, key[:2], key, name)
+
+    def has(self, key, *names):
+        return self.enabled and all(os.path.exists(self.path(key, name)) for name in names)
+
+    def _target(self, key, name):
+        path = self.path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _write_atomic(self, path, write):
+        tmp_path = f"{path}.tmp{os.getpid()}"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def save_file(self, key, name, src_path):
+        if self.enabled:
+            self._write_atomic(self._target(key, name), lambda tmp: shutil.copyfile(src_path, tmp))
+
+    def restore_file(self, key, name, dest_path):
+        """Recopie l'artefact vers `dest_path` ; retourne False s'il est absent."""
+        if not self.has(key, name):
+            return False
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        shutil.copyfile(self.path(key, name), dest_path)
+        return True
+
+    def save_arrays(self, key, name, **arrays):
+        if self.enabled:
+            def write(tmp):
+                with open(tmp, 'wb') as f:
+                    np.savez(f, **arrays)
+            self._write_atomic(self._target(key, name), write)
+
+    def load_arrays(self, key, name):
+        with np.load(self.path(key, name)) as data:
+            return {k: data[k] for k in data.files}
+
+    def save_json(self, key, name, obj):
+        if self.enabled:
+            def write(tmp):
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(obj, f, ensure_ascii=False, default=str)
+            self._write_atomic(self._target(key, name), write)
+
+    def load_json(self, key, name):
+        with open(self.path(key, name), encoding='utf-8') as f:
+            return json.load(f)
@@ -1,6 +1,13 @@
 import requests
 import xml.etree.ElementTree as ET
+import bisect
+import hashlib
+import json
+import os
+import re
+import unicodedata
 from pathlib import Path
+from src.config import CACHE_DIR
 
 URL = "https://www.nosdeputes.fr/{legislature}/scrutins/xml"
 
@@ -23,36 +30,194 @@ THEMATIQUES = {
     ]
 }
 
-def classifier_titre(titre):
-    titre_clean = titre.lower()
-    for categorie, mots_cles in THEMATIQUES.items():
-        if any(mot in titre_clean for mot in mots_cles):
-            return categorie
-    return "Autres / Divers"
+AUTRES = "Autres / Divers"
 
 
-def get_scrutins_by_theme(legislature=16):
-    """Retourne un dict {theme: [ids]}.
+_COMBINING = re.compile('[\u0300-\u036f]')
 
-    Pour la 14e législature, le flux distant n'est pas utilisable — on lit
-    le fichier local `Data/scrutins.xml` et on applique les mêmes mots-clés.
-    Pour les autres législatures, on conserve l'accès distant comme avant.
+
+def fold(text):
+    """Minuscules sans accents : 'Écologie' -> 'ecologie'."""
+    return _COMBINING.sub('', unicodedata.normalize('NFKD', text.casefold()))
+
+
+def _trie_pattern(words):
+    """
+    Compile une liste de mots en alternance factorisée par préfixes communs
+    (['eau', 'ecologie'] -> 'e(?:au|cologie)'), qui privilégie le mot le plus
+    long. Le moteur d'expressions régulières écarte ainsi une position dès le
+    premier caractère, quelle que soit la taille de la liste.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        optional = '' in node
+        if not branches:
+            return ''
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return f"(?:{'|'.join(branches)}){'?' if optional else ''}"
+
+    return build(trie)
+
+
+class ThemeClassifier:
+    """
+    Classe les titres de scrutins par thème à l'aide d'une seule expression
+    régulière compilée à partir de tous les mots-clés.
+
+    Titres et mots-clés sont comparés sans accents ni majuscules. Avec
+    `word_boundary=True`, un mot-clé doit commencer un mot ("eau" reconnaît
+    "eaux" mais plus "nouveau") ; sinon il suffit qu'il apparaisse dans le titre.
     """
-    themes_map = {theme: [] for theme in THEMATIQUES.keys()}
 
+    def __init__(self, thematiques=None, word_boundary=True):
+        self.thematiques = THEMATIQUES if thematiques is None else thematiques
+        self.word_boundary = word_boundary
+        self.themes = list(self.thematiques)
+
+        # Un mot-clé reconnu implique aussi tous les mots-clés qui en sont préfixes
+        keyword_themes = {}
+        for idx, mots in enumerate(self.thematiques.values()):
+            for mot in mots:
+                keyword_themes.setdefault(fold(mot), set()).add(idx)
+        self._themes_of = {
+            kw: set().union(*(t for other, t in keyword_themes.items() if kw.startswith(other)))
+            for kw in keyword_themes
+        }
+
+        # Lookahead : toutes les positions de départ sont testées, même imbriquées
+        boundary = r'\b' if word_boundary else ''
+        self._pattern = re.compile(f"{boundary}(?=({_trie_pattern(keyword_themes)}))")
+
+    def cache_key(self):
+        payload = json.dumps([self.thematiques, self.word_boundary], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+    def matching_themes(self, titre):
+        """Retourne tous les thèmes reconnus dans le titre, dans l'ordre de THEMATIQUES."""
+        found = set()
+        for match in self._pattern.finditer(fold(titre)):
+            found |= self._themes_of[match.group(1)]
+        return [self.themes[i] for i in sorted(found)]
+
+    def classify(self, titre, all_matches=False):
+        """
+        Retourne le premier thème reconnu (ordre de THEMATIQUES) ou AUTRES ;
+        avec `all_matches=True`, la liste de tous les thèmes reconnus.
+        """
+        themes = self.matching_themes(titre)
+        if all_matches:
+            return themes
+        return themes[0] if themes else AUTRES
+
+    def classify_many(self, titres, all_matches=False):
+        """
+        Classe une liste de titres en un seul passage : les titres sont joints,
+        normalisés puis parcourus d'un bloc par l'expression compilée.
+        """
+        text = fold('\n'.join(titre.replace('\n', ' ') for titre in titres))
+        starts = [0]
+        for line in text.split('\n'):
+            starts.append(starts[-1] + len(line) + 1)
+
+        found = [set() for _ in titres]
+        for match in self._pattern.finditer(text):
+            found[bisect.bisect_right(starts, match.start()) - 1] |= self._themes_of[match.group(1)]
+
+        results = [[self.themes[i] for i in sorted(f)] for f in found]
+        if all_matches:
+            return results
+        return [themes[0] if themes else AUTRES for themes in results]
+
+
+CLASSIFIER = ThemeClassifier()
+
+
+def classifier_titre(titre):
+    return CLASSIFIER.classify(titre)
+
+
+def _themes_cache_path(legislature, cache_dir, classifier, all_matches):
+    suffix = "_multi" if all_matches else ""
+    return os.path.join(cache_dir, 'themes', f"themes_{legislature}_{classifier.cache_key()}{suffix}.json")
+
+
+def _scrutins_root(legislature):
+    """Racine XML de la liste des scrutins (fichier local pour la 14e législature)."""
     if int(legislature) == 14:
         local_path = Path(__file__).resolve().parents[1] / 'Data' / 'scrutins.xml'
         if not local_path.exists():
             raise FileNotFoundError(f"Fichier local attendu introuvable: {local_path}")
 
         tree = ET.parse(local_path)
-        root = tree.getroot()
-    else:
-        url = URL.format(legislature=legislature)
-        response = requests.get(url)
-        response.raise_for_status()
-        root = ET.fromstring(response.content)
+        return tree.getroot()
+
+    url = URL.format(legislature=legislature)
+    response = requests.get(url)
+    response.raise_for_status()
+    return ET.fromstring(response.content)
+
+
+def get_scrutin_dates(legislature=16, cache_dir=CACHE_DIR, refresh=False):
+    """
+    Retourne un dict {scrutin_id: date (AAAA-MM-JJ)}, lu dans la même liste
+    que la classification et mis en cache sur disque de la même façon.
+    """
+    cache_path = os.path.join(cache_dir, "themes", f"dates_{legislature}.json") if cache_dir else None
+    if cache_path and not refresh and os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            return {int(k): v for k, v in json.load(f).items()}
+
+    dates = {}
+    for s in _scrutins_root(legislature).findall('scrutin'):
+        num_el, date_el = s.find('numero'), s.find('date')
+        if num_el is None or date_el is None or not date_el.text:
+            continue
+        try:
+            dates[int(num_el.text)] = date_el.text
+        except ValueError:
+            continue
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(dates, f)
+    return dates
 
+
+def get_scrutins_by_theme(legislature=16, cache_dir=CACHE_DIR, refresh=False, classifier=None,
+                          all_matches=False):
+    """Retourne un dict {theme: [ids]}.
+
+    Pour la 14e législature, le flux distant n'est pas utilisable — on lit
+    le fichier local `Data/scrutins.xml` et on applique les mêmes mots-clés.
+    Pour les autres législatures, on conserve l'accès distant comme avant.
+
+    Le résultat est mis en cache sur disque, par législature et par jeu de
+    mots-clés : tant que `THEMATIQUES` ne change pas, aucune requête n'est
+    refaite (sauf `refresh=True`). `cache_dir=None` désactive le cache.
+
+    Avec `all_matches=True`, un scrutin est rangé dans chacun des thèmes
+    reconnus et non seulement dans le premier.
+    """
+    classifier = classifier or CLASSIFIER
+    cache_path = _themes_cache_path(legislature, cache_dir, classifier, all_matches) if cache_dir else None
+    if cache_path and not refresh and os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    themes_map = {theme: [] for theme in classifier.themes}
+
+    root = _scrutins_root(legislature)
+
+    ids, titres = [], []
     for s in root.findall('scrutin'):
         num_el = s.find('numero')
         titre_el = s.find('titre')
@@ -60,36 +225,38 @@ def get_scrutins_by_theme(legislature=16):
             continue
 
         try:
-            id_scrutin = int(num_el.text)
+            ids.append(int(num_el.text))
         except Exception:
             continue
+        titres.append(titre_el.text)
 
-        titre = titre_el.text.lower()
+    for id_scrutin, themes in zip(ids, classifier.classify_many(titres, all_matches=True)):
+        for theme in (themes if all_matches else themes[:1]):
+            themes_map[theme].append(id_scrutin)
 
-        matched = False
-        for theme, mots in THEMATIQUES.items():
-            if any(mot in titre for mot in mots):
-                themes_map[theme].append(id_scrutin)
-                matched = True
-                break
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(themes_map, f, ensure_ascii=False)
 
     return themes_map
 
-themes_map = get_scrutins_by_theme()
-print("Nombre de scrutins par thème :")
-for theme, ids in themes_map.items():
-    print(f"  {theme}: {len(ids)} scrutins")
 
-def main():
+def main(legislature=16):
+    themes_map = get_scrutins_by_theme(legislature)
+    print("Nombre de scrutins par thème :")
+    for theme, ids in themes_map.items():
+        print(f"  {theme}: {len(ids)} scrutins")
+
     print(f"Connexion à l'API NosDéputés.fr...")
     try:
-        response = requests.get(URL)
+        response = requests.get(URL.format(legislature=legislature))
         response.raise_for_status()
         root = ET.fromstring(response.content)
         scrutins_xml = root.findall('scrutin')
 
         data_par_theme = {theme: [] for theme in THEMATIQUES.keys()}
-        data_par_theme["Autres / Divers"] = []
+        data_par_theme[AUTRES] = []
 
         for s in scrutins_xml:
             info = {
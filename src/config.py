@@ -1,5 +1,9 @@
+import os
 import numpy as np
 
+# Caches persistants (thèmes, artefacts intermédiaires)
+CACHE_DIR = os.path.join("Output", ".cache")
+
 LEGIS_MAP = {
     13: "2007-2012",
     14: "2012-2017",
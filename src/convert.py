@@ -1,7 +1,11 @@
 import xml.etree.ElementTree as ET
 import unicodedata
 import csv
+import hashlib
+import json
 import os
+import numpy as np
+from src.identity import DeputyIndex
 
 
 def slugify(name: str) -> str:
@@ -22,105 +26,281 @@ def slugify(name: str) -> str:
     return s
 
 
-def parse_table_noms(path):
-    tree = ET.parse(path)
-    root = tree.getroot()
+def _file_sha1(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-    organ_map = {}
-    for org in root.findall('.//organe'):
-        type_attr = None
-        for k, v in org.attrib.items():
-            if k.endswith('type'):
-                type_attr = v
-                break
-
-        if type_attr == 'GroupePolitique_type':
-            uid_el = org.find('uid')
-            abbrev_el = org.find('libelleAbrege')
-            if uid_el is not None and uid_el.text:
-                uid = uid_el.text.strip()
-                abbrev = abbrev_el.text.strip() if (abbrev_el is not None and abbrev_el.text) else uid
-                organ_map[uid] = abbrev
 
+def _load_names_cache(path, cache_path):
+    """
+    Relit `cache_path` s'il correspond encore à `path` : même mtime, ou à
+    défaut même empreinte SHA-1 (fichier recopié ou simplement touché).
+    """
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, encoding='utf-8') as f:
+        cache = json.load(f)
+
+    stat = os.stat(path)
+    if cache.get('mtime') != stat.st_mtime or cache.get('size') != stat.st_size:
+        if cache.get('sha1') != _file_sha1(path):
+            return None
+        _save_names_cache(path, cache_path, cache['organ_map'], cache['actor_map'], cache['sha1'])
+    return cache['organ_map'], cache['actor_map']
+
+
+def _save_names_cache(path, cache_path, organ_map, actor_map, sha1=None):
+    stat = os.stat(path)
+    cache = {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha1': sha1 or _file_sha1(path),
+        'organ_map': organ_map,
+        'actor_map': actor_map,
+    }
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+
+
+def parse_table_noms(path, cache_path=None):
+    """
+    Lit `table_noms.xml` en un seul parcours `iterparse` et retourne
+    (organ_map, actor_map) : acronyme de chaque groupe politique et
+    prénom / nom de chaque acteur.
+
+    Si `cache_path` est fourni, les tables y sont sauvegardées et réutilisées
+    tant que le fichier source n'a pas changé.
+    """
+    if cache_path:
+        cached = _load_names_cache(path, cache_path)
+        if cached is not None:
+            return cached
+
+    organ_map = {}
     actor_map = {}
-    for actor in root.findall('.//acteur'):
-        uid_el = actor.find('uid')
-        if uid_el is None or not uid_el.text:
-            continue
-        uid = uid_el.text.strip()
-        prenom_el = actor.find('./etatCivil/ident/prenom')
-        nom_el = actor.find('./etatCivil/ident/nom')
-        prenom = prenom_el.text.strip() if (prenom_el is not None and prenom_el.text) else ''
-        nom = nom_el.text.strip() if (nom_el is not None and nom_el.text) else ''
-        actor_map[uid] = {'prenom': prenom, 'nom': nom}
+    for event, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag == 'organe':
+            type_attr = next((v for k, v in elem.attrib.items() if k.endswith('type')), None)
+            if type_attr == 'GroupePolitique_type':
+                uid_el = elem.find('uid')
+                abbrev_el = elem.find('libelleAbrege')
+                if uid_el is not None and uid_el.text:
+                    uid = uid_el.text.strip()
+                    abbrev = abbrev_el.text.strip() if (abbrev_el is not None and abbrev_el.text) else uid
+                    organ_map[uid] = abbrev
+            elem.clear()
+
+        elif elem.tag == 'acteur':
+            uid_el = elem.find('uid')
+            if uid_el is not None and uid_el.text:
+                prenom_el = elem.find('./etatCivil/ident/prenom')
+                nom_el = elem.find('./etatCivil/ident/nom')
+                prenom = prenom_el.text.strip() if (prenom_el is not None and prenom_el.text) else ''
+                nom = nom_el.text.strip() if (nom_el is not None and nom_el.text) else ''
+                actor_map[uid_el.text.strip()] = {'prenom': prenom, 'nom': nom}
+            elem.clear()
 
+    if cache_path:
+        _save_names_cache(path, cache_path, organ_map, actor_map)
     return organ_map, actor_map
 
 
-def build_dataset(scrutins_path, table_noms_path, out_path):
-    print('Parsing noms (peut prendre quelques secondes)...')
-    organ_map, actor_map = parse_table_noms(table_noms_path)
+def _position_from_tag(tag):
+    tag = tag.lower()
+    if 'pour' in tag:
+        return 'pour'
+    elif 'contre' in tag:
+        return 'contre'
+    elif 'abst' in tag:
+        return 'abstention'
+    return None
+
+
+def iter_votes(scrutins_path, organ_map, actor_map, slugs=None):
+    """
+    Parcourt `scrutins.xml` en flux et produit un tuple
+    (depute, groupe, position, scrutin_id) par vote nominatif.
+
+    Chaque scrutin est libéré dès qu'il a été lu et le slug d'un acteur
+    n'est calculé qu'une seule fois. Deux homonymes reçoivent des slugs
+    distincts (`-2`, `-3`... pour le second, le troisième rencontré). Si
+    `slugs` est fourni, il reçoit la correspondance {acteurRef: slug} des
+    votants rencontrés.
+    """
+    slugs = {} if slugs is None else slugs
+    used = set(slugs.values())
+
+    def depute_slug(pa):
+        depute = slugs.get(pa)
+        if depute is None:
+            actor = actor_map.get(pa)
+            if actor:
+                name = f"{actor['prenom']} {actor['nom']}".strip()
+                depute = slugify(name)
+            else:
+                depute = pa.lower()
+            base, n = depute, 1
+            while depute in used:
+                n += 1
+                depute = f"{base}-{n}"
+            used.add(depute)
+            slugs[pa] = depute
+        return depute
 
-    rows = []
-    print('Parcours des scrutins...')
     context = ET.iterparse(scrutins_path, events=('end',))
     for event, elem in context:
-        if elem.tag == 'scrutin':
-            numero_el = elem.find('numero')
-            scrutin_id = numero_el.text.strip() if (numero_el is not None and numero_el.text) else None
+        if elem.tag != 'scrutin':
+            continue
 
-            for groupe in elem.findall('.//groupes/groupe'):
-                org_ref_el = groupe.find('organeRef')
-                if org_ref_el is None or not org_ref_el.text:
-                    continue
-                org_ref = org_ref_el.text.strip()
-                groupe_acro = organ_map.get(org_ref, org_ref)
+        numero_el = elem.find('numero')
+        scrutin_id = numero_el.text.strip() if (numero_el is not None and numero_el.text) else None
 
-                vote = groupe.find('vote')
-                if vote is None:
-                    continue
-                decomp = vote.find('decompteNominatif')
-                if decomp is None:
+        for groupe in elem.findall('.//groupes/groupe'):
+            org_ref_el = groupe.find('organeRef')
+            if org_ref_el is None or not org_ref_el.text:
+                continue
+            org_ref = org_ref_el.text.strip()
+            groupe_acro = organ_map.get(org_ref, org_ref)
+
+            vote = groupe.find('vote')
+            if vote is None:
+                continue
+            decomp = vote.find('decompteNominatif')
+            if decomp is None:
+                continue
+
+            for pos_block in list(decomp):
+                position = _position_from_tag(pos_block.tag)
+                if position is None:
                     continue
 
-                for pos_block in list(decomp):
-                    tag = pos_block.tag.lower()
-                    if 'pour' in tag:
-                        position = 'pour'
-                    elif 'contre' in tag:
-                        position = 'contre'
-                    elif 'abst' in tag:
-                        position = 'abstention'
-                    else:
+                for votant in pos_block.findall('votant'):
+                    acteur_el = votant.find('acteurRef')
+                    if acteur_el is None or not acteur_el.text:
                         continue
+                    yield (depute_slug(acteur_el.text.strip()), groupe_acro, position, scrutin_id)
 
-                    for votant in pos_block.findall('votant'):
-                        acteur_el = votant.find('acteurRef')
-                        if acteur_el is None or not acteur_el.text:
-                            continue
-                        pa = acteur_el.text.strip()
-                        actor = actor_map.get(pa)
-                        if actor:
-                            name = f"{actor['prenom']} {actor['nom']}".strip()
-                            depute = slugify(name)
-                        else:
-                            depute = pa.lower()
+        elem.clear()
 
-                        rows.append((depute, groupe_acro, position, scrutin_id))
 
-            elem.clear()
+class ColumnarWriter:
+    """
+    Écrit les votes sous forme de colonnes entières compactes dans un dossier :
+    `depute.npy` (int32), `groupe.npy` (int16), `position.npy` (int8, codes de
+    MAP_VOTE) et `scrutin_id.npy` (int32), plus `dictionaries.json` pour
+    retrouver les libellés des codes député / groupe.
+
+    Les lots sont ajoutés à des fichiers binaires bruts pendant le parcours puis
+    recopiés par morceaux en `.npy` : la mémoire reste bornée par la taille d'un lot.
+    """
+
+    DTYPES = {'depute': np.int32, 'groupe': np.int16, 'position': np.int8, 'scrutin_id': np.int32}
+    POSITION_CODES = {'pour': 1, 'contre': -1, 'abstention': 0}
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self.codes = {'depute': {}, 'groupe': {}}
+        self.n_rows = 0
+        self._raw = {col: open(self._raw_path(col), 'wb') for col in self.DTYPES}
+
+    def _raw_path(self, col):
+        return os.path.join(self.out_dir, f'{col}.raw')
+
+    def _encode(self, col, value):
+        mapping = self.codes[col]
+        code = mapping.get(value)
+        if code is None:
+            code = mapping[value] = len(mapping)
+        return code
+
+    def write_batch(self, rows):
+        columns = {
+            'depute': [self._encode('depute', r[0]) for r in rows],
+            'groupe': [self._encode('groupe', r[1]) for r in rows],
+            'position': [self.POSITION_CODES[r[2]] for r in rows],
+            'scrutin_id': [int(r[3]) if r[3] is not None else -1 for r in rows],
+        }
+        for col, values in columns.items():
+            np.asarray(values, dtype=self.DTYPES[col]).tofile(self._raw[col])
+        self.n_rows += len(rows)
+
+    def close(self, chunk_rows=1_000_000):
+        for col, dtype in self.DTYPES.items():
+            self._raw[col].close()
+            raw_path = self._raw_path(col)
+            out = np.lib.format.open_memmap(
+                os.path.join(self.out_dir, f'{col}.npy'), mode='w+', dtype=dtype, shape=(self.n_rows,)
+            )
+            itemsize = np.dtype(dtype).itemsize
+            for start in range(0, self.n_rows, chunk_rows):
+                count = min(chunk_rows, self.n_rows - start)
+                out[start:start + count] = np.fromfile(raw_path, dtype=dtype, count=count, offset=start * itemsize)
+            out.flush()
+            del out
+            os.remove(raw_path)
+
+        labels = {col: list(mapping) for col, mapping in self.codes.items()}
+        with open(os.path.join(self.out_dir, 'dictionaries.json'), 'w', encoding='utf-8') as f:
+            json.dump(labels, f, ensure_ascii=False)
+
+
+def build_dataset(scrutins_path, table_noms_path, out_path, batch_size=50_000, columnar_dir=None,
+                  names_cache_path=None, identity=None, legislature=None):
+    """
+    Convertit `scrutins.xml` en CSV (depute, groupe, position, scrutin_id) en
+    écrivant par lots de `batch_size` lignes au fil du parcours.
+
+    Si `columnar_dir` est fourni, les mêmes votes sont aussi écrits au format
+    colonnes entières (voir `ColumnarWriter`). `names_cache_path` est transmis
+    à `parse_table_noms`. Avec `identity` (`DeputyIndex`), les `acteurRef`
+    des votants sont reliés à leur slug dans l'index des députés.
+    """
+    print('Lecture des noms...')
+    organ_map, actor_map = parse_table_noms(table_noms_path, cache_path=names_cache_path)
 
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
-    print(f'Ecriture de {out_path} ({len(rows)} lignes)')
+    columnar = ColumnarWriter(columnar_dir) if columnar_dir else None
+
+    print('Parcours des scrutins...')
+    n_rows = 0
     with open(out_path, 'w', newline='', encoding='utf-8') as f:
         writer = csv.writer(f)
         writer.writerow(['depute', 'groupe', 'position', 'scrutin_id'])
-        for r in rows:
-            writer.writerow(r)
+
+        batch = []
+        slugs = {}
+        for row in iter_votes(scrutins_path, organ_map, actor_map, slugs=slugs):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                writer.writerows(batch)
+                if columnar:
+                    columnar.write_batch(batch)
+                n_rows += len(batch)
+                batch = []
+
+        if batch:
+            writer.writerows(batch)
+            if columnar:
+                columnar.write_batch(batch)
+            n_rows += len(batch)
+
+    if identity is not None:
+        identity.register(list(dict.fromkeys(slugs.values())), legislature=legislature, acteurs=slugs)
+
+    if columnar:
+        columnar.close()
+        print(f'Colonnes écrites dans {columnar_dir}')
+    print(f'Ecriture de {out_path} ({n_rows} lignes)')
 
 
 if __name__ == '__main__':
     scrutins_path = os.path.join('Data', 'scrutins.xml')
     table_noms_path = os.path.join('Data', 'table_noms.xml')
+    names_cache_path = os.path.join('Data', 'table_noms.cache.json')
     out_path = os.path.join('Output', '2012-2017', 'dataset_scrutins_14.csv')
-    build_dataset(scrutins_path, table_noms_path, out_path)
+    build_dataset(scrutins_path, table_noms_path, out_path, names_cache_path=names_cache_path,
+                  identity=DeputyIndex(), legislature=14)
@@ -1,66 +1,330 @@
 import requests
 import xml.etree.ElementTree as ET
 import pandas as pd
+import hashlib
+import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from src import instrument
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+NOT_FOUND_STATUS = {404, 410}
+
+
+class RateLimiter:
+    """
+    Espace les requêtes pour ne pas dépasser `rate` requêtes par seconde,
+    tous threads confondus. `rate=None` désactive la limite.
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
 
 class ScrutinFetcher:
-    def __init__(self, legislature):
-        self.base_url = f"https://www.nosdeputes.fr/{legislature}/scrutin"
+    def __init__(self, legislature, workers=10, rate_limit=None, max_retries=3, backoff=0.5,
+                 timeout=10, base_url=None):
+        self.base_url = base_url or f"https://www.nosdeputes.fr/{legislature}/scrutin"
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate_limit)
+        self._probed = {}
+
+        # Connexions keep-alive partagées par tous les threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _get(self, url, headers=None):
+        """
+        GET avec nouvelles tentatives (backoff exponentiel) sur les erreurs réseau
+        et les réponses 429 / 5xx. Retourne None si la ressource est indisponible.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            if attempt:
+                instrument.count('fetch.retries')
+            instrument.count('fetch.requests')
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout, headers=headers)
+                instrument.observe('fetch.latency_s', time.perf_counter() - start)
+                instrument.count('fetch.bytes', len(response.content))
+                instrument.count(f'fetch.status.{response.status_code}')
+                if response.status_code not in RETRY_STATUS:
+                    return response
+            except requests.exceptions.RequestException:
+                instrument.count('fetch.errors')
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        instrument.count('fetch.failures')
+        return None
 
     def get_scrutin_data(self, scrutin_id):
+        data, _ = self.fetch_scrutin(scrutin_id)
+        return data
+
+    def fetch_scrutin(self, scrutin_id, etag=None):
+        """
+        Télécharge un scrutin et retourne (votes, meta), où meta contient le
+        SHA-1 du XML reçu et l'ETag éventuel du serveur.
+
+        Avec `etag`, la requête est conditionnelle : un 304 retourne
+        (None, {'not_modified': True}). Un scrutin inexistant (404, ou sans votes)
+        retourne (None, None) ; un échec après toutes les tentatives (erreur
+        réseau, 5xx, réponse illisible) retourne (None, {'failed': True}).
+        """
+        if etag is None and scrutin_id in self._probed:
+            return self._probed.pop(scrutin_id)
+
         url = f"{self.base_url}/{scrutin_id}/xml"
-        try:
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code != 200 or not response.content:
-                return None
+        headers = {'If-None-Match': etag} if etag else None
+        response = self._get(url, headers=headers)
+        if response is not None and response.status_code == 304:
+            return None, {'not_modified': True}
+        if response is None:
+            return None, {'failed': True}
+        if response.status_code in NOT_FOUND_STATUS:
+            return None, None
+        if response.status_code != 200:
+            return None, {'failed': True}
+        if not response.content:
+            return None, None
 
+        try:
             root = ET.fromstring(response.content)
-            
-            first_vote = root.find('vote')
-            if first_vote is None:
-                return None
-
-            votes_list = []
-            for vote in root.findall('vote'):
-                votes_list.append({
-                    'depute': vote.find('parlementaire_slug').text,
-                    'groupe': vote.find('parlementaire_groupe_acronyme').text,
-                    'position': vote.find('position').text,
-                    'scrutin_id': scrutin_id
-                })
-            return pd.DataFrame(votes_list)
-            
-        except (requests.exceptions.RequestException, ET.ParseError):
-            return None
-
-
-
-def download(legislature, workers=10):
-    fetcher = ScrutinFetcher(legislature=legislature)
-    all_data = []
-    scrutin_id_start = 1
-    chunk_size = 100
-    stop_searching = False
-    
-
-    while not stop_searching:
-        current_chunk_ids = range(scrutin_id_start, scrutin_id_start + chunk_size)
-        print(f"Analyse du bloc {scrutin_id_start} à {scrutin_id_start + chunk_size}...")
-        
-        chunk_results = []
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            future_to_id = {executor.submit(fetcher.get_scrutin_data, i): i for i in current_chunk_ids}
-            for future in as_completed(future_to_id):
-                res = future.result()
-                if res is not None:
-                    chunk_results.append(res)
-        
-        if not chunk_results:
-            stop_searching = True
+        except ET.ParseError:
+            return None, {'failed': True}
+
+        first_vote = root.find('vote')
+        if first_vote is None:
+            return None, None
+
+        votes_list = []
+        for vote in root.findall('vote'):
+            votes_list.append({
+                'depute': vote.find('parlementaire_slug').text,
+                'groupe': vote.find('parlementaire_groupe_acronyme').text,
+                'position': vote.find('position').text,
+                'scrutin_id': scrutin_id
+            })
+        meta = {
+            'sha1': hashlib.sha1(response.content).hexdigest(),
+            'etag': response.headers.get('ETag'),
+        }
+        return pd.DataFrame(votes_list), meta
+
+    def _probe(self, scrutin_id, width, attempts=3):
+        """
+        Premier scrutin existant parmi [scrutin_id, scrutin_id + width), ou None.
+        Les scrutins téléchargés sont gardés pour ne pas être redemandés.
+
+        Un scrutin en échec n'est pas compté comme absent, ce qui fausserait la
+        recherche du dernier ID : il est redemandé jusqu'à `attempts` fois,
+        puis `ConnectionError` est levée.
+        """
+        for i in range(scrutin_id, scrutin_id + width):
+            for _ in range(attempts):
+                data, meta = self.fetch_scrutin(i)
+                if data is not None or not (meta and meta.get('failed')):
+                    break
+            else:
+                raise ConnectionError(f"Scrutin {i} indisponible, dernier ID introuvable")
+            if data is not None:
+                self._probed[i] = (data, meta)
+                return i
+        return None
+
+    def find_last_id(self, start=1, gap_tolerance=5, end_gap=100):
+        """
+        Cherche le dernier identifiant de scrutin valide par recherche exponentielle
+        puis dichotomique, les sondages tolérant des trous de moins de `gap_tolerance` IDs.
+
+        Un trou plus large peut tromper la dichotomie : le candidat trouvé n'est
+        retenu que si les `end_gap` IDs suivants sont tous absents ; sinon la
+        recherche reprend à partir du scrutin trouvé au-delà du trou.
+        Retourne start - 1 s'il n'existe aucun scrutin à partir de `start`.
+        Lève `ConnectionError` si un sondage échoue malgré les nouvelles tentatives.
+        """
+        end_gap = max(end_gap, gap_tolerance)
+        lo = self._probe(start, end_gap)
+        while lo is not None:
+            step = 1
+            while self._probe(lo + step, gap_tolerance) is not None:
+                lo += step
+                step *= 2
+            hi = lo + step
+
+            # Invariant : le sondage réussit en lo et échoue en hi
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if self._probe(mid, gap_tolerance) is not None:
+                    lo = mid
+                else:
+                    hi = mid
+
+            # ]lo, lo + gap_tolerance] est vide (sondage de hi = lo + 1) : lo est le dernier
+            # scrutin, sauf s'il en existe un plus loin, jusqu'à lo + end_gap
+            after = self._probe(hi + gap_tolerance, end_gap - gap_tolerance)
+            if after is None:
+                return lo
+            lo = after
+        return start - 1
+
+
+COLUMNS = ['depute', 'groupe', 'position', 'scrutin_id']
+
+
+def _load_sync_state(csv_path, state_path):
+    """
+    Relit l'état de synchronisation. Un CSV plus long que la taille enregistrée
+    provient d'un lot interrompu avant la mise à jour de l'état : il est tronqué.
+    Une réécriture du CSV interrompue après l'écriture de l'état (`rewrite`) est
+    terminée. Un CSV existant sans état (téléchargement complet antérieur) sert
+    de point de départ, sans empreintes connues.
+    """
+    if os.path.exists(state_path) and os.path.exists(csv_path):
+        with open(state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        rewrite = state.pop('rewrite', None)
+        if rewrite and os.path.exists(rewrite):
+            os.replace(rewrite, csv_path)
+        if os.path.getsize(csv_path) > state['csv_size']:
+            with open(csv_path, 'r+b') as f:
+                f.truncate(state['csv_size'])
+        return state
+
+    if os.path.exists(csv_path):
+        ids = pd.read_csv(csv_path, usecols=['scrutin_id'])['scrutin_id']
+        last_id = int(ids.max()) if len(ids) else 0
+        return {'last_id': last_id, 'csv_size': os.path.getsize(csv_path), 'scrutins': {}}
+
+    os.makedirs(os.path.dirname(csv_path) or '.', exist_ok=True)
+    pd.DataFrame(columns=COLUMNS).to_csv(csv_path, index=False)
+    return {'last_id': 0, 'csv_size': os.path.getsize(csv_path), 'scrutins': {}}
+
+
+def _save_sync_state(state, state_path):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def _append_rows(csv_path, frames):
+    with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+        if frames:
+            pd.concat(frames, ignore_index=True)[COLUMNS].to_csv(f, header=False, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def sync(legislature, csv_path, state_path=None, workers=10, rate_limit=None, recheck_last=0,
+         commit_every=100, fetcher=None):
+    """
+    Met à jour `csv_path` de façon incrémentale : seuls les scrutins postérieurs
+    au dernier ID enregistré sont téléchargés puis ajoutés au CSV.
+
+    Les scrutins sont demandés en flux continu par un pool de `workers` threads
+    partageant la même session HTTP ; les résultats sont ajoutés au CSV dans
+    l'ordre des IDs, et l'état (dernier ID, taille du CSV validée, SHA-1 / ETag
+    par scrutin, scrutins en échec) est écrit tous les `commit_every` scrutins,
+    si bien qu'une exécution interrompue reprend là où elle s'est arrêtée.
+
+    Un scrutin en échec après toutes les tentatives (à distinguer d'un scrutin
+    inexistant) est noté dans l'état et redemandé à la synchronisation suivante.
+    `recheck_last` re-vérifie les N derniers scrutins déjà stockés (requêtes
+    conditionnelles) et remplace ceux qui ont changé.
+
+    Retourne un résumé dont `updated` liste les scrutins ajoutés ou remplacés.
+    """
+    state_path = state_path or f"{os.path.splitext(csv_path)[0]}.sync.json"
+    fetcher = fetcher or ScrutinFetcher(legislature=legislature, workers=workers, rate_limit=rate_limit)
+    state = _load_sync_state(csv_path, state_path)
+    known = state['scrutins']
+    failed = set(state.get('failed', []))
+    updated = set()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        changed = {}
+        recheck_ids = [i for i in range(max(1, state['last_id'] - recheck_last + 1), state['last_id'] + 1)
+                       if i not in failed]
+        etags = [known.get(str(i), {}).get('etag') for i in recheck_ids]
+        for scrutin_id, (data, meta) in zip(recheck_ids, executor.map(fetcher.fetch_scrutin, recheck_ids, etags)):
+            if data is not None and meta['sha1'] != known.get(str(scrutin_id), {}).get('sha1'):
+                changed[scrutin_id] = (data, meta)
+
+        if changed:
+            print(f"Scrutins modifiés depuis la dernière synchronisation : {sorted(changed)}")
+            df = pd.read_csv(csv_path)
+            df = pd.concat([df[~df['scrutin_id'].isin(changed)]] + [d for d, _ in changed.values()],
+                           ignore_index=True)
+            tmp_path = f"{csv_path}.tmp"
+            df[COLUMNS].to_csv(tmp_path, index=False)
+            for scrutin_id, (_, meta) in changed.items():
+                known[str(scrutin_id)] = meta
+            updated.update(changed)
+            # L'état décrit le nouveau CSV avant son remplacement, qu'il termine en cas d'interruption
+            state['csv_size'] = os.path.getsize(tmp_path)
+            _save_sync_state({**state, 'rewrite': tmp_path}, state_path)
+            os.replace(tmp_path, csv_path)
+            _save_sync_state(state, state_path)
+
+        retry_ids = sorted(failed)
+        if retry_ids:
+            print(f"Nouvelle tentative pour les scrutins en échec : {retry_ids}")
+        first_new = state['last_id'] + 1
+        last_id = fetcher.find_last_id(start=first_new)
+        new_ids = range(first_new, last_id + 1)
+        if not new_ids:
+            print(f"Aucun nouveau scrutin après le n°{state['last_id']}.")
         else:
-            all_data.extend(chunk_results)
-            scrutin_id_start += chunk_size
+            print(f"Synchronisation des scrutins {first_new} à {last_id}...")
+
+        # Flux continu : le pool reste alimenté, les résultats sont validés dans l'ordre
+        ids = retry_ids + list(new_ids)
+        n_new, frames, pending = 0, [], []
+        for i, result in enumerate(executor.map(fetcher.fetch_scrutin, ids), 1):
+            pending.append(result)
+            if i % commit_every and i < len(ids):
+                continue
+
+            for scrutin_id, (data, meta) in zip(ids[i - len(pending):i], pending):
+                failed.discard(scrutin_id)
+                if data is not None:
+                    frames.append(data)
+                    known[str(scrutin_id)] = meta
+                    updated.add(scrutin_id)
+                    n_new += 1
+                elif meta and meta.get('failed'):
+                    failed.add(scrutin_id)
+                state['last_id'] = max(state['last_id'], scrutin_id)
+            _append_rows(csv_path, frames)
+            state['csv_size'] = os.path.getsize(csv_path)
+            state['failed'] = sorted(failed)
+            _save_sync_state(state, state_path)
+            frames, pending = [], []
+            if new_ids:
+                print(f"Scrutins synchronisés : {state['last_id']}/{last_id}")
 
-    return pd.concat(all_data, ignore_index=True)
\ No newline at end of file
+    if failed:
+        print(f"Scrutins en échec, redemandés à la prochaine synchronisation : {sorted(failed)}")
+    return {'new': n_new, 'changed': len(changed), 'failed': sorted(failed), 'last_id': state['last_id'],
+            'updated': sorted(updated)}
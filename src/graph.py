@@ -1,98 +1,163 @@
 import networkx as nx
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from src.config import PARTY_COLORS, DEFAULT_COLOR, MAP_VOTE
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
+from scipy import sparse
+from src.similarity import iter_similarity_blocks, iter_window_similarity
+from src.similarity_store import SimilarityMatrix
+from src.pca import PCAModel
+from src.layout import compute_layout
+from src.render import render_network, render_pca
 
-def generate_graph(sim_matrix, df_meta, legislature, k_neighbors=10, min_voters=10, output_path="graph.png"):
+def _knn_from_blocks(blocks, n, k_neighbors):
     """
-    Génère un graphe de réseau basé sur les k plus proches voisins (k-NN).
+    Sélectionne, bloc par bloc, les k plus proches voisins de chaque ligne
+    (hors elle-même, poids strictement positifs) et retourne une matrice
+    d'adjacence creuse orientée.
+    """
+    rows, cols, weights = [], [], []
+    for start, stop, block in blocks:
+        block = np.where(np.isnan(block), -np.inf, block)
+        local = np.arange(stop - start)
+        block[local, local + start] = -np.inf
+
+        k = min(k_neighbors, n - 1)
+        if k <= 0:
+            continue
+
+        # Seuil du k-ième voisin ; à égalité, on garde les premiers (comme nlargest)
+        kth = np.partition(block, -k, axis=1)[:, -k][:, None]
+        above = block > kth
+        ties = (block == kth) & (np.cumsum(block == kth, axis=1) <= k - above.sum(axis=1, keepdims=True))
+        selected = (above | ties) & (block > 0)
+
+        r, c = np.nonzero(selected)
+        rows.append(r + start)
+        cols.append(c)
+        weights.append(block[r, c])
+
+    if not rows:
+        return sparse.csr_matrix((n, n))
+    return sparse.csr_matrix(
+        (np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n)
+    )
+
+
+def knn_from_similarity(sim_matrix, k_neighbors=10, block_size=256):
+    """
+    Graphe k-NN (adjacence creuse) à partir d'une matrice de similarité
+    (DataFrame, tableau ou `SimilarityMatrix`), lue par blocs de lignes.
+    Une `SimilarityMatrix` écrite avec `neighbors=k_neighbors` fournit ses
+    voisins, choisis sur les similarités exactes plutôt que stockées.
+    """
+    if isinstance(sim_matrix, SimilarityMatrix):
+        if sim_matrix.knn is not None and sim_matrix.knn_k == k_neighbors:
+            return sparse.csr_matrix(sim_matrix.knn)
+        return _knn_from_blocks(sim_matrix.iter_blocks(block_size), len(sim_matrix), k_neighbors)
+    values = sim_matrix.values if isinstance(sim_matrix, pd.DataFrame) else sim_matrix
+    n = values.shape[0]
+    blocks = ((s, min(s + block_size, n), np.array(values[s:s + block_size], dtype=float))
+              for s in range(0, n, block_size))
+    return _knn_from_blocks(blocks, n, k_neighbors)
+
+
+def knn_from_votes(pivot_votes, k_neighbors=10, method='cosine', block_size=256):
+    """
+    Graphe k-NN (adjacence creuse) calculé directement sur la matrice de votes :
+    la similarité n'est évaluée que par blocs et jamais stockée en entier.
+    """
+    blocks = iter_similarity_blocks(pivot_votes, method=method, block_size=block_size)
+    return _knn_from_blocks(blocks, pivot_votes.shape[0], k_neighbors)
+
+
+def iter_window_knn(pivot_votes, window, k_neighbors=10, step=1, method='cosine', dates=None):
+    """
+    Graphes k-NN sur fenêtres glissantes (voir `iter_window_similarity`) :
+    produit (scrutins de la fenêtre, adjacence creuse).
     """
+    for scrutins, sim in iter_window_similarity(pivot_votes, window, step=step, method=method, dates=dates):
+        yield scrutins, knn_from_similarity(sim, k_neighbors)
+
+
+def knn_to_graph(adjacency, labels):
+    """
+    Convertit l'adjacence k-NN en graphe networkx non orienté, en un seul appel.
+    Seuls les députés ayant au moins un voisin apparaissent dans le graphe.
+    """
+    labels = np.asarray(labels)
+    coo = adjacency.tocoo()
     G = nx.Graph()
+    G.add_weighted_edges_from(zip(labels[coo.row], labels[coo.col], coo.data.tolist()))
+    return G
 
-    depute_to_group = df_meta.set_index('depute')['groupe'].to_dict()
 
+def build_knn_graph(sim_matrix, k_neighbors=10, votes=None, method='cosine'):
+    """
+    Graphe k-NN des députés. Si `sim_matrix` vaut None, les voisins sont
+    calculés directement sur la matrice de votes `votes` avec la similarité `method`.
+    """
     print(f"Construction du graphe (k={k_neighbors})...")
-    for depute in sim_matrix.index:
-        similarities = sim_matrix.loc[depute].drop(labels=[depute])
-        
-        top_k = similarities.nlargest(k_neighbors)
-        
-        for neighbor, weight in top_k.items():
-            if weight > 0:
-                G.add_edge(depute, neighbor, weight=weight)
-
-    node_colors = []
-    nodes_to_remove = []
-    
-    for node in G.nodes():
-        group = depute_to_group.get(node, "NI")
-        node_colors.append(PARTY_COLORS.get(group, '#808080'))
-
-    plt.figure(figsize=(15, 12))
-    pos = nx.spring_layout(G, k=0.15, iterations=50, weight='weight')
-
-    nx.draw_networkx_edges(G, pos, alpha=0.1, edge_color='gray')
-    
-    nx.draw_networkx_nodes(G, pos, 
-                           node_size=50, 
-                           node_color=node_colors, 
-                           alpha=0.8)
-
-    plt.title(f"Réseau des Députés - Législature {legislature}\n(k-NN cosine, k={k_neighbors})", fontsize=15)
-    plt.axis('off')
-    
-    plt.savefig(output_path, dpi=300, bbox_inches='tight')
-    plt.close()
-    
+    if sim_matrix is None:
+        adjacency = knn_from_votes(votes, k_neighbors, method=method)
+        return knn_to_graph(adjacency, votes.index)
+    adjacency = knn_from_similarity(sim_matrix, k_neighbors)
+    return knn_to_graph(adjacency, sim_matrix.index)
+
+
+def network_frames(G, pos, df_meta):
+    """
+    Tables des sommets (depute, groupe, x, y) et des arêtes (source, target,
+    weight) du graphe disposé, lues par `render_network`.
+    """
+    depute_to_group = df_meta.set_index('depute')['groupe'].to_dict()
+    nodes = pd.DataFrame([(node, depute_to_group.get(node, "NI"), x, y) for node, (x, y) in pos.items()],
+                         columns=['depute', 'groupe', 'x', 'y'])
+    edges = pd.DataFrame(list(G.edges(data='weight')), columns=['source', 'target', 'weight'])
+    return nodes, edges
+
+
+def draw_network(G, pos, df_meta, legislature, k_neighbors, output_path="graph.png", method='cosine'):
+    """Dessine le graphe `G` aux positions `pos`, coloré par groupe politique."""
+    nodes, edges = network_frames(G, pos, df_meta)
+    render_network(nodes, edges, legislature, k_neighbors, output_path, method=method)
+
+
+def generate_graph(sim_matrix, df_meta, legislature, k_neighbors=10, min_voters=10, output_path="graph.png",
+                   votes=None, method='cosine', seed=0, layout_init=None):
+    """
+    Génère un graphe de réseau basé sur les k plus proches voisins (k-NN).
+
+    Si `sim_matrix` vaut None, les voisins sont calculés directement sur la
+    matrice de votes `votes` avec la similarité `method`. La disposition est
+    déterministe pour un `seed` donné ; `layout_init` permet un démarrage à
+    chaud (voir `compute_layout`).
+    """
+    G = build_knn_graph(sim_matrix, k_neighbors, votes=votes, method=method)
+    pos = compute_layout(G, seed=seed, similarity=sim_matrix, init=layout_init)
+    draw_network(G, pos, df_meta, legislature, k_neighbors, output_path, method=method)
     return G
 
 
-def generate_pca_plot(pivot_votes, df, output_path, theme_name):
+def pca_coordinates(pivot_votes, df, model=None):
+    """
+    Coordonnées ACP des députés (depute, groupe, PC1, PC2) et part de variance
+    des deux axes. Sans `model`, l'ACP est ajustée sur `pivot_votes` ; sinon les
+    députés sont projetés sur les axes de `model` (par exemple ceux de la
+    législature entière, pour comparer les thèmes dans un même repère).
+    """
+    model = model or PCAModel.fit(pivot_votes)
+    df_pca = model.transform(pivot_votes).reset_index()
 
-    data_clean = pivot_votes.fillna(0)
-    
-    scaled_data = StandardScaler().fit_transform(data_clean)
-    
-    pca = PCA(n_components=2)
-    coords = pca.fit_transform(scaled_data)
-    
-    df_pca = pd.DataFrame(coords, columns=['PC1', 'PC2'], index=data_clean.index).reset_index()
-    
     meta = df[['depute', 'groupe']].drop_duplicates()
     df_pca = df_pca.merge(meta, on='depute', how='left')
-    
-    plt.figure(figsize=(12, 8))
-    
-    for groupe in df_pca['groupe'].unique():
-        mask = df_pca['groupe'] == groupe
-        
-        couleur = PARTY_COLORS.get(groupe, '#808080')
-        
-        plt.scatter(
-            df_pca.loc[mask, 'PC1'], 
-            df_pca.loc[mask, 'PC2'], 
-            label=groupe, 
-            color=couleur,
-            alpha=0.7,
-            edgecolors='white',
-            linewidths=0.5,
-            s=40
-        )
-
-    var_exp = pca.explained_variance_ratio_
-    
-    plt.title(f"Analyse en Composantes Principales - Thème : {theme_name}", fontsize=14)
-    plt.xlabel(f"PC1 : Clivage principal ({var_exp[0]:.1%} de variance)", fontsize=11)
-    plt.ylabel(f"PC2 : Clivage secondaire ({var_exp[1]:.1%} de variance)", fontsize=11)
-    
-    plt.legend(title="Groupes Politiques", bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.grid(True, linestyle='--', alpha=0.3)
-    plt.axhline(0, color='black', linewidth=0.8, alpha=0.5)
-    plt.axvline(0, color='black', linewidth=0.8, alpha=0.5)
-    
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=300)
-    plt.close()
+    return df_pca[['depute', 'groupe', 'PC1', 'PC2']], model.explained_variance_ratio
+
 
+def generate_pca_plot(pivot_votes, df, output_path, theme_name, model=None, coords_path=None):
+    """
+    ACP des députés (PC1 x PC2), voir `pca_coordinates`. Les coordonnées sont
+    aussi écrites en CSV dans `coords_path` si fourni.
+    """
+    df_pca, var_exp = pca_coordinates(pivot_votes, df, model)
+    if coords_path:
+        df_pca.to_csv(coords_path, index=False)
+    render_pca(df_pca, var_exp, theme_name, output_path, projected=model is not None)
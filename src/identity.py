@@ -0,0 +1,291 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.votes import ABSENT, NON_VOTANT
+
+
+@contextmanager
+def _locked(path, timeout=60, poll=0.05):
+    """
+    Verrou exclusif sur le fichier `path.lock`, partagé entre processus.
+
+    Le verrou est posé par le système sur le fichier ouvert (`flock`, ou
+    `msvcrt.locking` sous Windows) : il est libéré à la fermeture, y compris
+    quand le processus qui le tient est tué. Le fichier lui-même reste en place.
+    """
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    with open(lock_path, 'a+b') as f:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Verrou toujours pris : {lock_path}")
+                time.sleep(poll)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class DeputyIndex:
+    """
+    Index persistant des députés : chaque personne reçoit un identifiant entier
+    stable, commun à toutes les législatures.
+
+    Pour les données de l'Assemblée, la clé d'un député est son `acteurRef`
+    (PA...) : deux homonymes dont les noms donnent le même slug restent deux
+    personnes. Le slug (nosdeputes.fr, ou `slugify` du nom dans `convert.py`)
+    est un attribut de l'identifiant (`label`) et un alias pour les données
+    qui n'ont que lui :
+
+    - `acteurs` : {acteurRef: identifiant} ;
+    - `slugs` : {slug: [identifiants]} (plusieurs en cas d'homonymie) ;
+    - `legislatures` : {législature: {slug: identifiant}}, le slug de chaque
+      député tel qu'il figure dans les votes de la législature.
+
+    Un slug se résout d'abord dans sa législature, puis globalement s'il ne
+    désigne qu'une personne ; sinon un nouvel identifiant est créé. Les
+    identifiants sont attribués dans l'ordre d'apparition et ne changent plus.
+
+    Le fichier JSON est relu et réécrit sous verrou à chaque enregistrement,
+    si bien que plusieurs processus peuvent alimenter le même index.
+    """
+
+    def __init__(self, path=os.path.join("Output", "deputy_index.json")):
+        self.path = path
+        self._read()
+
+    def _read(self):
+        data = {}
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        self.labels = data.get('labels', [])
+        self.acteurs = data.get('acteurs', {})
+        # Ancien format : un identifiant par slug, une liste d'identifiants par législature
+        self.slugs = {slug: ids if isinstance(ids, list) else [ids] for slug, ids in data.get('slugs', {}).items()}
+        self.legislatures = {
+            int(k): v if isinstance(v, dict) else {self.labels[i]: i for i in v}
+            for k, v in data.get('legislatures', {}).items()
+        }
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'labels': self.labels, 'slugs': self.slugs, 'acteurs': self.acteurs,
+                       'legislatures': self.legislatures}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _new(self, slug):
+        ident = len(self.labels)
+        self.labels.append(slug)
+        self.slugs.setdefault(slug, []).append(ident)
+        return ident
+
+    def _resolve(self, slug, legislature=None):
+        if legislature is not None and slug in self.legislatures.get(legislature, {}):
+            return self.legislatures[legislature][slug]
+        known = self.slugs.get(slug, [])
+        if len(known) == 1:
+            return known[0]
+        if known:
+            print(f"Slug ambigu sans acteurRef : {slug} (identifiants {known}), nouveau député créé")
+        return self._new(slug)
+
+    def register(self, slugs, legislature=None, acteurs=None):
+        """
+        Enregistre des députés et retourne leurs identifiants (tableau int32,
+        dans l'ordre de `slugs`). `acteurs` ({acteurRef: slug}) donne la clé
+        de chaque député de l'Assemblée et son slug ; `legislature` note le
+        slug sous lequel chacun figure dans la législature.
+        """
+        with self._lock():
+            self._read()
+            mandate = self.legislatures.setdefault(int(legislature), {}) if legislature is not None else {}
+            for acteur, slug in (acteurs or {}).items():
+                ident = self.acteurs.get(acteur)
+                if ident is None:
+                    ident = self.acteurs[acteur] = self._new(slug)
+                elif ident not in self.slugs.setdefault(slug, []):
+                    self.slugs[slug].append(ident)
+                if legislature is not None:
+                    mandate[slug] = ident
+            ids = np.array([self._resolve(slug, legislature and int(legislature)) for slug in slugs],
+                           dtype=np.int32)
+            if legislature is not None:
+                mandate.update(zip(slugs, ids.tolist()))
+            self._write()
+        return ids
+
+    @contextmanager
+    def _lock(self):
+        if not self.path:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with _locked(self.path):
+            yield
+
+    def ids(self, keys, legislature=None):
+        """
+        Identifiants d'`acteurRef` ou de slugs (résolus dans `legislature` si
+        elle est donnée), -1 si inconnu ou ambigu, sans modifier l'index.
+        """
+        mandate = self.legislatures.get(legislature, {})
+
+        def lookup(key):
+            if key in self.acteurs:
+                return self.acteurs[key]
+            if key in mandate:
+                return mandate[key]
+            known = self.slugs.get(key, [])
+            return known[0] if len(known) == 1 else -1
+
+        return np.array([lookup(k) for k in keys], dtype=np.int32)
+
+    def label(self, ids):
+        """Slug de référence de chaque identifiant."""
+        labels = np.asarray(self.labels, dtype=object)
+        return labels[np.asarray(ids, dtype=np.int64)]
+
+
+class JointVoteMatrix:
+    """
+    Votes de plusieurs législatures dans une seule matrice creuse par blocs :
+    une ligne par identifiant de `DeputyIndex`, un bloc de colonnes par
+    législature. Un député réélu occupe la même ligne dans tous les blocs.
+
+    - `values` (csr, int8) : +1 pour, -1 contre (les abstentions ne sont pas stockées) ;
+    - `presence` (csr, bool) : votes exprimés, abstentions comprises ;
+    - `columns` : MultiIndex (legislature, scrutin_id) ;
+    - `blocks` : {législature: slice des colonnes} ;
+    - `groups` : {législature: Series identifiant -> dernier groupe}.
+    """
+
+    def __init__(self, values, presence, columns, blocks, index, groups=None):
+        self.values = values
+        self.presence = presence
+        self.columns = columns
+        self.blocks = blocks
+        self.index = index
+        self.groups = groups or {}
+
+    @classmethod
+    def from_matrices(cls, matrices, index):
+        """
+        Assemble les `VoteMatrix` {législature: matrice}. Les lignes sont
+        rangées selon `depute_ids` quand la matrice en a (chargée par un
+        `VoteMatrixStore` doté du même index), sinon les députés sont
+        enregistrés dans `index` par leur slug.
+        """
+        rows, cols, codes = [], [], []
+        columns, blocks, groups, offset = [], {}, {}, 0
+        for legislature, votes in sorted(matrices.items()):
+            ids = votes.depute_ids
+            if ids is None:
+                ids = index.register(votes.deputes, legislature=legislature)
+            r, c = np.nonzero((votes.codes != ABSENT) & (votes.codes != NON_VOTANT))
+            rows.append(ids[r])
+            cols.append(c + offset)
+            codes.append(votes.codes[r, c])
+            columns += [(legislature, s) for s in votes.scrutins]
+            blocks[legislature] = slice(offset, offset + votes.shape[1])
+            meta = votes.meta().groupby('depute')['groupe'].last()
+            groups[legislature] = pd.Series(meta.to_numpy(), index=ids[votes.deputes.get_indexer(meta.index)])
+            offset += votes.shape[1]
+
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int32)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+        codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int8)
+        shape = (len(index), offset)
+        expressed = codes != 0
+        values = sparse.csr_array((codes[expressed], (rows[expressed], cols[expressed])), shape=shape)
+        presence = sparse.csr_array((np.ones(len(rows), dtype=bool), (rows, cols)), shape=shape)
+        columns = pd.MultiIndex.from_tuples(columns, names=['legislature', 'scrutin_id'])
+        return cls(values, presence, columns, blocks, index, groups)
+
+    def block(self, legislature):
+        """(values, presence) restreints aux scrutins d'une législature."""
+        cols = self.blocks[legislature]
+        return self.values[:, cols], self.presence[:, cols]
+
+    def mandates(self):
+        """Tableau booléen identifiant x législature : le député a-t-il voté dans la législature ?"""
+        legislatures = sorted(self.blocks)
+        voted = np.column_stack([np.asarray(self.block(leg)[1].sum(axis=1)).ravel() > 0
+                                 for leg in legislatures])
+        return pd.DataFrame(voted, index=pd.Index(range(len(self.index)), name='id'), columns=legislatures)
+
+    def reelected(self, min_legislatures=2):
+        """Identifiants des députés ayant voté dans au moins `min_legislatures` législatures."""
+        counts = self.mandates().sum(axis=1)
+        return counts.index[counts >= min_legislatures].to_numpy()
+
+    def similarity(self, legislature, ids):
+        """Similarité cosinus (dense) entre les députés `ids` sur les scrutins d'une législature."""
+        values = self.block(legislature)[0][np.asarray(ids)].astype(np.float64)
+        norms = np.sqrt(np.asarray(values.multiply(values).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        gram = (values @ values.T).toarray()
+        return gram / np.outer(norms, norms)
+
+    def alliance_stability(self):
+        """
+        Stabilité des alliances des réélus entre deux législatures consécutives :
+        pour chaque député présent dans les deux, corrélation entre ses
+        similarités aux autres réélus dans l'une et dans l'autre (1 : mêmes
+        proches, 0 : aucun lien). Une ligne par (identifiant, législatures).
+        """
+        legislatures = sorted(self.blocks)
+        mandates = self.mandates()
+        frames = []
+        for before, after in zip(legislatures, legislatures[1:]):
+            ids = mandates.index[mandates[before] & mandates[after]].to_numpy()
+            if len(ids) < 3:
+                continue
+            sim_before, sim_after = self.similarity(before, ids), self.similarity(after, ids)
+            off_diagonal = ~np.eye(len(ids), dtype=bool)
+            a = np.where(off_diagonal, sim_before, np.nan)
+            b = np.where(off_diagonal, sim_after, np.nan)
+            a -= np.nanmean(a, axis=1, keepdims=True)
+            b -= np.nanmean(b, axis=1, keepdims=True)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                stability = np.nansum(a * b, axis=1) / np.sqrt(np.nansum(a * a, axis=1) * np.nansum(b * b, axis=1))
+            frames.append(pd.DataFrame({
+                'id': ids,
+                'depute': self.index.label(ids),
+                'from': before,
+                'to': after,
+                'groupe_from': self.groups[before].reindex(ids).to_numpy(),
+                'groupe_to': self.groups[after].reindex(ids).to_numpy(),
+                'stability': stability,
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['id', 'depute', 'from', 'to', 'groupe_from', 'groupe_to', 'stability'])
+        return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,177 @@
+import cProfile
+import itertools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Bornes (en secondes) de l'histogramme des latences de téléchargement
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus entier depuis son démarrage (Mo), ou None."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Recorder:
+    """
+    Collecte légère de mesures d'exécution, partagée par les threads d'un processus :
+
+    - spans nommés (`span`) : durée murale, temps CPU et mémoire, avec des
+      attributs libres (législature, thème...) ;
+    - compteurs (`count`) : requêtes, octets, nouvelles tentatives... ;
+    - histogrammes (`observe`) : latences réparties selon `LATENCY_BUCKETS`.
+
+    Un span fournit un dict d'attributs modifiable dans le bloc (par exemple
+    `attrs['cached'] = True`), enregistré avec les mesures à la sortie.
+
+    La mémoire vient de `ru_maxrss`, qui ne donne que le pic du processus
+    entier : `process_peak_rss_mb` est ce pic à la sortie du span (il inclut
+    les étapes précédentes), `rss_growth_mb` sa hausse pendant le span, soit
+    la mémoire que l'étape a demandée au-delà du pic déjà atteint (0 si elle
+    est restée en dessous).
+
+    `profile_stage` désigne un span à profiler avec cProfile ; chaque
+    exécution du span est écrite dans `profile_dir/profile_<span>_<pid>_<n>.prof`
+    (lisible par pstats ou snakeviz), `n` numérotant les exécutions du
+    processus, et le chemin est noté dans le span (`profile`). Pour un échantillonneur externe (py-spy), le pid de chaque span
+    est enregistré et `current_span` donne l'étape en cours du thread.
+    """
+
+    def __init__(self, profile_stage=None, profile_dir="."):
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profile_seq = itertools.count(1)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self.counters = {}
+            self.histograms = {}
+
+    @property
+    def current_span(self):
+        stack = getattr(self._local, 'stack', [])
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, **attrs):
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(name)
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+        rss_before = peak_rss_mb()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield attrs
+        finally:
+            if profiler:
+                profiler.disable()
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            stack.pop()
+            rss_after = peak_rss_mb()
+            record = {'name': name, 'parent': stack[-1] if stack else None, 'wall_s': round(wall, 6),
+                      'cpu_s': round(cpu, 6), 'process_peak_rss_mb': rss_after,
+                      'rss_growth_mb': rss_after - rss_before if rss_after is not None else None,
+                      'pid': os.getpid(), **attrs}
+            if profiler:
+                os.makedirs(self.profile_dir, exist_ok=True)
+                with self._lock:
+                    seq = next(self._profile_seq)
+                path = os.path.join(self.profile_dir, f"profile_{name}_{os.getpid()}_{seq}.prof")
+                profiler.dump_stats(path)
+                record['profile'] = path
+                print(f"Profil de l'étape {name} écrit dans {path}")
+            with self._lock:
+                self.spans.append(record)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            hist = self.histograms.setdefault(name, {'buckets': list(buckets), 'counts': [0] * (len(buckets) + 1),
+                                                     'sum': 0.0, 'count': 0})
+            hist['counts'][bisect_left(hist['buckets'], value)] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    def collect(self):
+        """Retourne les mesures accumulées (sérialisables) et les remet à zéro."""
+        with self._lock:
+            snapshot = {'spans': self.spans, 'counters': self.counters, 'histograms': self.histograms}
+            self.spans, self.counters, self.histograms = [], {}, {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """Ajoute les mesures d'un autre processus (voir `collect`)."""
+        with self._lock:
+            self.spans += snapshot['spans']
+            for name, value in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for name, other in snapshot['histograms'].items():
+                hist = self.histograms.get(name)
+                if hist is None:
+                    self.histograms[name] = other
+                    continue
+                hist['counts'] = [a + b for a, b in zip(hist['counts'], other['counts'])]
+                hist['sum'] += other['sum']
+                hist['count'] += other['count']
+
+    def report(self):
+        """
+        Rapport d'exécution : totaux par étape (nombre, durée murale et CPU,
+        maxima de `process_peak_rss_mb` et de `rss_growth_mb`), spans
+        détaillés, compteurs et histogrammes.
+        """
+        with self._lock:
+            stages = {}
+            for record in self.spans:
+                stage = stages.setdefault(record['name'], {'count': 0, 'wall_s': 0.0, 'cpu_s': 0.0,
+                                                           'process_peak_rss_mb': None, 'rss_growth_mb': None})
+                stage['count'] += 1
+                stage['wall_s'] = round(stage['wall_s'] + record['wall_s'], 6)
+                stage['cpu_s'] = round(stage['cpu_s'] + record['cpu_s'], 6)
+                for key in ('process_peak_rss_mb', 'rss_growth_mb'):
+                    if record[key] is not None:
+                        stage[key] = max(stage[key] or 0, record[key])
+            return {'stages': stages, 'spans': list(self.spans), 'counters': dict(self.counters),
+                    'histograms': dict(self.histograms)}
+
+    def write_report(self, path, **extra):
+        report = {**extra, **self.report()}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        return report
+
+
+# Collecteur du processus courant, utilisé par tous les modules
+RECORDER = Recorder()
+
+
+def span(name, **attrs):
+    return RECORDER.span(name, **attrs)
+
+
+def count(name, value=1):
+    RECORDER.count(name, value)
+
+
+def observe(name, value):
+    RECORDER.observe(name, value)
@@ -0,0 +1,138 @@
+import numpy as np
+import networkx as nx
+from scipy import sparse
+from scipy.sparse.linalg import eigsh
+from scipy.spatial import cKDTree
+
+
+def _symmetric_weights(G, nodes):
+    """Adjacence pondérée symétrique (creuse) du graphe, dans l'ordre de `nodes`."""
+    W = nx.to_scipy_sparse_array(G, nodelist=nodes, weight='weight', format='csr')
+    return W.maximum(W.T)
+
+
+def spectral_positions(weights, seed=0):
+    """
+    Positions initiales spectrales : deux premiers vecteurs propres non triviaux
+    de la matrice de poids normalisée D^-1/2 W D^-1/2. `weights` est l'adjacence
+    du graphe ou une matrice de similarité (les valeurs négatives sont ignorées).
+    """
+    if sparse.issparse(weights):
+        W = sparse.csr_array(weights).maximum(0)
+    else:
+        W = np.clip(np.nan_to_num(np.asarray(weights, dtype=float)), 0, None)
+    n = W.shape[0]
+    if n <= 3:
+        return np.random.default_rng(seed).random((n, 2))
+
+    degree = np.asarray(W.sum(axis=1)).ravel()
+    inv_sqrt = 1 / np.sqrt(np.where(degree > 0, degree, 1))
+    if sparse.issparse(W):
+        M = sparse.diags_array(inv_sqrt) @ W @ sparse.diags_array(inv_sqrt)
+    else:
+        M = W * inv_sqrt[:, None] * inv_sqrt[None, :]
+
+    if n < 500 or not sparse.issparse(M):
+        values, vectors = np.linalg.eigh(M.toarray() if sparse.issparse(M) else M)
+    else:
+        v0 = np.random.default_rng(seed).random(n)
+        values, vectors = eigsh(M, k=3, which='LA', v0=v0)
+    order = np.argsort(values)[::-1]
+    coords = vectors[:, order[1:3]] * inv_sqrt[:, None]
+
+    # Signe déterministe, puis léger bruit pour séparer les points confondus
+    coords *= np.where(coords.sum(axis=0) < 0, -1, 1)
+    span = np.ptp(coords, axis=0)
+    coords = (coords - coords.min(axis=0)) / np.where(span > 0, span, 1)
+    return coords + np.random.default_rng(seed).uniform(-1e-3, 1e-3, coords.shape)
+
+
+def force_layout(W, pos, iterations=50, temperature=0.1, cutoff=2.0):
+    """
+    Fruchterman-Reingold « à grille » : la répulsion n'est calculée qu'entre
+    sommets distants de moins de `cutoff` x k (paires trouvées par un k-d tree),
+    soit O(n log n) par itération au lieu de O(n²). L'attraction suit les arêtes
+    de l'adjacence creuse `W`. Même loi de forces et même refroidissement que
+    `nx.spring_layout` (k = 1/sqrt(n), déplacement borné par la température).
+    """
+    pos = np.array(pos, dtype=float)
+    n = len(pos)
+    if n < 2:
+        return pos
+    k = np.sqrt(1.0 / n)
+    coo = sparse.triu(sparse.coo_array(W), k=1).tocoo()
+    u, v, w = coo.row, coo.col, coo.data
+
+    t = max(np.ptp(pos, axis=0).max(), 1e-9) * temperature
+    dt = t / (iterations + 1)
+    for _ in range(iterations):
+        disp = np.zeros_like(pos)
+
+        pairs = cKDTree(pos).query_pairs(cutoff * k, output_type='ndarray')
+        if len(pairs):
+            i, j = pairs[:, 0], pairs[:, 1]
+            delta = pos[i] - pos[j]
+            dist = np.maximum(np.linalg.norm(delta, axis=1), 0.01)
+            force = delta * (k * k / dist ** 2)[:, None]
+            disp += _accumulate(i, force, n) - _accumulate(j, force, n)
+
+        if len(u):
+            delta = pos[u] - pos[v]
+            dist = np.maximum(np.linalg.norm(delta, axis=1), 0.01)
+            force = delta * (w * dist / k)[:, None]
+            disp += _accumulate(v, force, n) - _accumulate(u, force, n)
+
+        length = np.maximum(np.linalg.norm(disp, axis=1), 0.01)
+        pos += disp * (t / length)[:, None]
+        t -= dt
+    return pos
+
+
+def _accumulate(index, values, n):
+    return np.column_stack([np.bincount(index, weights=values[:, d], minlength=n) for d in range(2)])
+
+
+def compute_layout(G, seed=0, iterations=50, similarity=None, init=None):
+    """
+    Positions des sommets de `G` (dict nœud -> (x, y)), déterministes pour un
+    `seed` donné.
+
+    Les positions initiales sont spectrales, calculées sur `similarity` (DataFrame
+    de similarité indexé par député) si fourni, sinon sur l'adjacence du graphe.
+    `init` (dict nœud -> (x, y), par exemple la disposition de la législature
+    précédente) sert de démarrage à chaud : les sommets connus partent de leur
+    ancienne position, les nouveaux du barycentre de leurs voisins connus, et
+    le refroidissement part d'une température plus basse.
+    """
+    nodes = list(G.nodes())
+    if not nodes:
+        return {}
+    W = _symmetric_weights(G, nodes)
+
+    if similarity is not None:
+        sub = similarity.reindex(index=nodes, columns=nodes).values
+        pos = spectral_positions(sub, seed)
+    else:
+        pos = spectral_positions(W, seed)
+
+    temperature = 0.1
+    known = np.array([node in init for node in nodes]) if init else np.zeros(len(nodes), dtype=bool)
+    if known.any():
+        old = np.array([init[node] for node, ok in zip(nodes, known) if ok], dtype=float)
+        span = max(np.ptp(old, axis=0).max(), 1e-9)
+        pos[known] = (old - old.min(axis=0)) / span
+        # Barycentre des voisins déjà placés pour les nouveaux venus
+        weights = W[:, np.flatnonzero(known)]
+        total = np.asarray(weights.sum(axis=1)).ravel()
+        placed = (~known) & (total > 0)
+        pos[placed] = (weights @ pos[known])[placed] / total[placed, None]
+        temperature = 0.05
+
+    pos = force_layout(W, pos, iterations=iterations, temperature=temperature)
+
+    # Même cadrage que `nx.spring_layout` : centré en 0, étendue [-1, 1]
+    pos -= pos.mean(axis=0)
+    extent = np.abs(pos).max()
+    if extent > 0:
+        pos /= extent
+    return dict(zip(nodes, pos))
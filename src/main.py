@@ -1,19 +1,141 @@
+import argparse
+import json
+import networkx as nx
+import numpy as np
 import pandas as pd
 import os
-from src.fetcher import ScrutinFetcher, download
-from src.similarity import compute_similarity, MAP_VOTE, filter_by_voters
-from src.distribution import generate_distrib_plot
-from src.graph import generate_graph, generate_pca_plot
+from src.similarity import filter_by_voters, ThemeGrams
+from src.distribution import group_counts
+from src.graph import build_knn_graph, iter_window_knn, network_frames, pca_coordinates
+from src.layout import compute_layout
 from src.config import LEGIS_MAP
 from src.properties import compute_graph_metrics, print_report
-from src.classification import get_scrutins_by_theme
-from src.stats import analyze_attendance, plot_voter_distribution
+from src.classification import get_scrutin_dates, get_scrutins_by_theme
+from src.stats import analyze_attendance, voters_per_scrutin
+from src.store import VoteMatrixStore
+from src.identity import DeputyIndex, JointVoteMatrix
+from src.scheduler import run_grid
+from src.cache import ArtifactCache, content_hash
+from src.pca import PCAModel
+from src.similarity_store import SimilarityMatrix
+from src.render import PRESETS, figure_job, render_figures
+from src import instrument
+from src.instrument import span
 
 
-import pandas as pd
+# Une seule lecture / une seule matrice par législature, partagées entre les thèmes
+VOTE_STORE = VoteMatrixStore(identity=DeputyIndex())
+ARTIFACT_CACHE = ArtifactCache()
+
+
+def legislature_pca(legislature, store=None, cache=None):
+    """
+    ACP ajustée une fois sur tous les votes de la législature, mise en cache
+    (composantes, moyennes, écarts-types) pour y projeter les thèmes.
+    """
+    store = store or VOTE_STORE
+    cache = cache or ARTIFACT_CACHE
+    votes = store.load(legislature).drop_unvoted()
+    key = content_hash('pca-model', votes.codes, np.asarray(votes.index, dtype=str), np.asarray(votes.columns))
+    if cache.has(key, 'pca_model.npz'):
+        return key, PCAModel.from_arrays(cache.load_arrays(key, 'pca_model.npz'))
+    model = PCAModel.fit(votes)
+    cache.save_arrays(key, 'pca_model.npz', **model.to_arrays())
+    return key, model
+
+
+def legislature_theme_grams(legislature, method, min_voters, store=None, cache=None, themes=None):
+    """
+    Comptages de similarité de chaque thème de la législature (`ThemeGrams`),
+    calculés en un passage sur ses scrutins puis mis en cache : la similarité
+    d'un thème, d'une réunion de thèmes ou de la législature entière s'en déduit
+    sans relire les votes.
+
+    Ils sont calculés par `scheduler.prepare_legislature`, avant les tâches de
+    la législature, qui les relisent ensuite depuis le cache.
+    """
+    store = store or VOTE_STORE
+    cache = cache or ARTIFACT_CACHE
+    themes = themes if themes is not None else get_scrutins_by_theme(legislature=legislature)
+    votes = filter_by_voters(store.load(legislature), min_voters, store.participation(legislature))
+    key = content_hash('theme-grams', votes.codes, np.asarray(votes.index, dtype=str), np.asarray(votes.columns),
+                       themes, method)
+    if cache.has(key, 'theme_grams.npz'):
+        return ThemeGrams.from_arrays(cache.load_arrays(key, 'theme_grams.npz'))
+    grams = ThemeGrams.compute(votes, themes, method=method)
+    cache.save_arrays(key, 'theme_grams.npz', **grams.to_arrays())
+    return grams
+
 
+def previous_layout(legislature, method, output_root="Output", stem=None):
+    """
+    Positions du réseau de la législature précédente (dict député -> (x, y)),
+    ou None si elle n'a pas encore été calculée. `stem` désigne un réseau
+    thématique (par défaut celui de la législature entière).
+    """
+    years = LEGIS_MAP.get(legislature - 1, f"legis_{legislature - 1}")
+    path = os.path.join(output_root, years, f"{stem or f'network_{method}'}_layout.csv")
+    if not os.path.exists(path):
+        return None
+    layout = pd.read_csv(path)
+    return {d: (x, y) for d, x, y in zip(layout['depute'], layout['x'], layout['y'])}
 
-def run_full_pipeline(legislature, method, k_neighbors, min_voters, theme_name="Global", target_ids=None):
+
+def window_edges(pivot_votes, window, k_neighbors, step=1, method='cosine', dates=None):
+    """
+    Arêtes des graphes k-NN de chaque fenêtre glissante, en une table
+    (window, first_scrutin, last_scrutin, source, target, weight).
+    """
+    labels = np.asarray(pivot_votes.index)
+    frames = []
+    for i, (scrutins, adjacency) in enumerate(iter_window_knn(pivot_votes, window, k_neighbors, step=step,
+                                                                method=method, dates=dates)):
+        coo = adjacency.tocoo()
+        frames.append(pd.DataFrame({'window': i, 'first_scrutin': scrutins[0], 'last_scrutin': scrutins[-1],
+                                    'source': labels[coo.row], 'target': labels[coo.col], 'weight': coo.data}))
+    columns = ['window', 'first_scrutin', 'last_scrutin', 'source', 'target', 'weight']
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def run_full_pipeline(legislature, method, k_neighbors, min_voters, theme_name="Global", target_ids=None, store=None,
+                      cache=None, pca_axes='theme', layout_seed=0, warm_start_layout=False, window=None,
+                      window_unit='scrutins', window_step=1, similarity_dtype='float32', similarity_top_k=None,
+                      theme_similarity=False, centrality='exact', centrality_samples=None, centrality_epsilon=0.1,
+                      centrality_seed=0):
+    """
+    Analyse complète d'une législature (ou d'un thème) et retourne un résumé :
+    statut, tailles de la matrice, fichiers produits et rapport de métriques.
+
+    Avec `pca_axes='global'`, l'ACP d'un thème est projetée sur les axes de la
+    législature entière au lieu d'être ré-ajustée sur les seuls scrutins du thème.
+    La disposition du réseau est déterministe pour `layout_seed` ; avec
+    `warm_start_layout`, elle part des positions de la législature précédente
+    si celle-ci a déjà été calculée (exécution séquentielle, ou relance).
+    Avec `window`, des graphes k-NN sont aussi calculés sur des fenêtres
+    glissantes de `window` scrutins (ou mois, `window_unit='months'`) avançant
+    de `window_step` scrutins, pour suivre l'évolution des proximités.
+    La matrice de similarité est écrite par blocs dans un fichier projeté en
+    mémoire (`similarity_dtype`), les voisins k-NN étant choisis avant la
+    conversion ; avec `similarity_top_k`, seules les plus
+    fortes similarités de chaque député sont conservées (voir `SimilarityMatrix`).
+    Avec `theme_similarity`, chaque thème a aussi son réseau k-NN ; les
+    similarités (thèmes et législature) sont alors déduites des comptages par
+    thème de `legislature_theme_grams`, calculés une seule fois par
+    `scheduler.prepare_legislature`.
+    La betweenness du rapport est calculée selon `centrality` ('exact',
+    'approx' ou 'parallel', voir `properties.compute_betweenness`) ; en mode
+    approché, `centrality_samples` pivots (ou le nombre déduit de
+    `centrality_epsilon`) sont tirés avec la graine `centrality_seed`.
+
+    Les coordonnées, la matrice de similarité, les arêtes k-NN et le rapport
+    sont mis en cache par empreinte des votes analysés et des paramètres : une
+    relance sur des données inchangées ne recalcule rien.
+
+    Aucune figure n'est dessinée ici : les données de chaque figure sont écrites
+    en CSV et décrites dans `result['figures']`, pour `render.render_figures`.
+    """
+    result = {'legislature': legislature, 'theme': theme_name, 'method': method,
+              'status': 'ok', 'outputs': [], 'figures': [], 'report': None}
     years = LEGIS_MAP.get(legislature, f"legis_{legislature}")
 
     theme_slug = theme_name.replace(" ", "_").replace("&", "et")
@@ -23,92 +145,289 @@ def run_full_pipeline(legislature, method, k_neighbors, min_voters, theme_name="
         os.makedirs(output_dir)
         print(f"Dossier créé : \"{output_dir}\"")
 
-    csv_path = os.path.join("Output", years, f"dataset_scrutins_{legislature}.csv")
-    
-    if os.path.exists(csv_path):
-        df = pd.read_csv(csv_path)
-    else:
-        os.makedirs(os.path.join("Output", years), exist_ok=True)
-        df = download(legislature=legislature, workers=10)   
-        df.to_csv(csv_path, index=False)
+    store = store or VOTE_STORE
+    cache = cache or ARTIFACT_CACHE
+    votes = store.load(legislature)
+    participation = store.participation(legislature)
 
     if target_ids is not None:
-        initial_count = df['scrutin_id'].nunique()
-        df = df[df['scrutin_id'].isin(target_ids)]
-        print(f"Thème {theme_name} : {df['scrutin_id'].nunique()} scrutins conservés sur {initial_count}")
+        initial_count = votes.shape[1]
+        votes = store.select(legislature, target_ids)
+        print(f"Thème {theme_name} : {votes.shape[1]} scrutins conservés sur {initial_count}")
 
-    if df.empty:
+    if not votes.listed.any():
         print(f"Aucun vote trouvé pour le thème {theme_name}. Passage au suivant.")
-        return
+        result['status'] = 'empty'
+        return result
 
+    stage = {'legislature': legislature, 'theme': theme_name, 'method': method}
     if theme_name == "Global":
-        attendance_df, group_stats = analyze_attendance(df, theme_name, top_n=10)
-        distrib_output = os.path.join(output_dir, f"presence_distrib_{theme_name.replace(' ', '_')}.png")
-        plot_voter_distribution(df, theme_name, distrib_output)
+        with span('attendance', **stage):
+            attendance_df, group_stats = analyze_attendance(votes, theme_name, top_n=10, participation=participation)
+        distrib_stem = os.path.join(output_dir, f"presence_distrib_{theme_name.replace(' ', '_')}")
+        voters = voters_per_scrutin(votes, participation)
+        voters.rename('votants').to_csv(f"{distrib_stem}.csv")
+        print(f"\nStats de participation pour {theme_name} :")
+        print(voters.describe())
+        result['outputs'].append(f"{distrib_stem}.csv")
+        result['figures'].append(figure_job('voters', distrib_stem, {'data': f"{distrib_stem}.csv"},
+                                            theme_name=theme_name))
+
+    with span('filter', **stage):
+        votes = filter_by_voters(votes, min_voters, participation)
+        df = votes.meta()
+        pivot_votes = votes.drop_unvoted()
+    result['n_deputes'], result['n_scrutins'] = pivot_votes.shape
 
-    df = filter_by_voters(df, min_voters)
-    df['vote_val'] = df['position'].map(MAP_VOTE)
-    
-    pivot_votes = df.pivot_table(index='depute', columns='scrutin_id', values='vote_val')
+    # Empreinte de la tranche de votes analysée (et des groupes, qui colorent les figures)
+    meta = df.sort_values(['depute', 'groupe'], ignore_index=True)
+    data_key = content_hash(pivot_votes.codes, np.asarray(pivot_votes.index, dtype=str),
+                            np.asarray(pivot_votes.columns), meta)
 
-    pca_output = os.path.join(output_dir, f"pca_{theme_name.replace(' ', '_')}.png")
-    generate_pca_plot(pivot_votes, df, pca_output, theme_name)
-    print(f"ACP générée : {pca_output}")
+    pca_stem = os.path.join(output_dir, f"pca_{theme_name.replace(' ', '_')}")
+    coords_output = f"{pca_stem}.csv"
+    with span('pca', **stage) as attrs:
+        model_key, model = legislature_pca(legislature, store, cache) if pca_axes == 'global' else (None, None)
+        pca_key = content_hash('pca', data_key, theme_name, model_key)
+        attrs['cached'] = cache.has(pca_key, 'pca.csv', 'pca.json')
+        if attrs['cached']:
+            cache.restore_file(pca_key, 'pca.csv', coords_output)
+            var_exp = cache.load_json(pca_key, 'pca.json')['explained_variance']
+        else:
+            df_pca, var_exp = pca_coordinates(pivot_votes, df, model)
+            var_exp = [float(v) for v in var_exp]
+            df_pca.to_csv(coords_output, index=False)
+            cache.save_file(pca_key, 'pca.csv', coords_output)
+            cache.save_json(pca_key, 'pca.json', {'explained_variance': var_exp})
+    print(f"ACP calculée : {coords_output}")
+    result['outputs'].append(coords_output)
+    result['figures'].append(figure_job('pca', pca_stem, {'data': coords_output}, theme_name=theme_name,
+                                        explained_variance=var_exp, projected=model is not None))
 
-    if theme_name=="Global":
+    if theme_name == "Global" or theme_similarity:
 
+        if theme_name == "Global":
+            distribution_stem = os.path.join(output_dir, "distribution")
+            group_counts(df).rename_axis('groupe').rename('deputes').to_csv(f"{distribution_stem}.csv")
+            result['outputs'].append(f"{distribution_stem}.csv")
+            result['figures'].append(figure_job('groups', distribution_stem, {'data': f"{distribution_stem}.csv"},
+                                                legislature=legislature))
 
-        generate_distrib_plot(df, legislature, output_path=os.path.join(os.path.join("Output", years), f"distribution.png"))
+            print(pivot_votes.describe())
 
-        print(pivot_votes.describe())
+        if similarity_top_k is not None and similarity_top_k < k_neighbors:
+            raise ValueError(f"similarity_top_k ({similarity_top_k}) doit être au moins égal à k ({k_neighbors})")
+        # Les k plus proches voisins sont choisis à l'écriture, sur les similarités avant conversion
+        sim_key = content_hash('similarity', data_key, method, similarity_dtype, similarity_top_k, k_neighbors)
+        sim_path = cache.path(sim_key, 'similarity') if cache.enabled else None
+        with span('similarity', **stage) as attrs:
+            attrs['cached'] = cache.has(sim_key, 'similarity.meta.npz')
+            if attrs['cached']:
+                sim_matrix = SimilarityMatrix.open(sim_path)
+            elif theme_similarity:
+                grams = legislature_theme_grams(legislature, method, min_voters, store, cache)
+                themes = None if theme_name == "Global" else [theme_name]
+                sim = grams.similarity(themes, deputes=pivot_votes.index).values
+                sim_matrix = SimilarityMatrix.write([(0, len(sim), sim)], pivot_votes.index, sim_path,
+                                                    dtype=similarity_dtype, top_k=similarity_top_k, method=method,
+                                                    neighbors=k_neighbors)
+            else:
+                sim_matrix = SimilarityMatrix.compute(pivot_votes, method=method, path=sim_path,
+                                                      dtype=similarity_dtype, top_k=similarity_top_k,
+                                                      neighbors=k_neighbors)
 
-        sim_matrix = compute_similarity(pivot_votes, method=method)
+        network_name = f"network_{method}" if theme_name == "Global" else f"network_{method}_{theme_slug}"
+        network_stem = os.path.join(output_dir, network_name)
+        layout_output = f"{network_stem}_layout.csv"
+        edges_output = f"{network_stem}_edges.csv"
+        graph_key = content_hash('graph', sim_key, legislature, k_neighbors, min_voters)
+        with span('knn', **stage) as attrs:
+            attrs['cached'] = cache.has(graph_key, 'knn.npz')
+            if attrs['cached']:
+                print(f"Graphe k-NN repris du cache (k={k_neighbors})")
+                edges = cache.load_arrays(graph_key, 'knn.npz')
+                G = nx.Graph()
+                G.add_nodes_from(edges['nodes'].tolist())
+                G.add_weighted_edges_from(zip(edges['source'].tolist(), edges['target'].tolist(),
+                                              edges['weight'].tolist()))
+            else:
+                G = build_knn_graph(sim_matrix, k_neighbors)
+                source, target, weight = zip(*G.edges(data='weight')) if G.number_of_edges() else ((), (), ())
+                cache.save_arrays(graph_key, 'knn.npz', nodes=np.array(list(G.nodes()), dtype=str),
+                                  source=np.array(source, dtype=str), target=np.array(target, dtype=str),
+                                  weight=np.array(weight, dtype=float))
 
-        G = generate_graph(sim_matrix, df, legislature, k_neighbors, min_voters, 
-                        output_path=os.path.join(output_dir, f"network_{method}.png"))
-        
+        # Disposition : mise en cache par graphe, graine et positions de départ
+        layout_init = previous_layout(legislature, method, stem=network_name) if warm_start_layout else None
+        layout_key = content_hash('layout', graph_key, layout_seed, layout_init)
+        with span('layout', **stage) as attrs:
+            attrs['cached'] = cache.restore_file(layout_key, 'layout.csv', layout_output)
+            if attrs['cached']:
+                pos = pd.read_csv(layout_output)
+                pos = {d: (x, y) for d, x, y in zip(pos['depute'], pos['x'], pos['y'])}
+            else:
+                pos = compute_layout(G, seed=layout_seed, similarity=sim_matrix, init=layout_init)
+        nodes, edges = network_frames(G, pos, df)
+        nodes.to_csv(layout_output, index=False)
+        edges.to_csv(edges_output, index=False)
+        cache.save_file(layout_key, 'layout.csv', layout_output)
+        result['outputs'] += [layout_output, edges_output]
+        result['figures'].append(figure_job('network', network_stem,
+                                            {'nodes': layout_output, 'edges': edges_output},
+                                            legislature=legislature, k_neighbors=k_neighbors, method=method,
+                                            theme_name=theme_name))
+
+        if window and theme_name == "Global":
+            windows_output = os.path.join(output_dir, f"network_{method}_windows.csv")
+            dates = get_scrutin_dates(legislature) if window_unit == 'months' else None
+            windows_key = content_hash('windows', data_key, method, k_neighbors, window, window_unit, window_step,
+                                       dates)
+            with span('windows', **stage) as attrs:
+                attrs['cached'] = cache.restore_file(windows_key, 'windows.csv', windows_output)
+                if not attrs['cached']:
+                    window_edges(pivot_votes, window, k_neighbors, window_step, method, dates).to_csv(
+                        windows_output, index=False)
+                    cache.save_file(windows_key, 'windows.csv', windows_output)
+            print(f"Graphes k-NN par fenêtre ({window} {window_unit}) : {windows_output}")
+            result['outputs'].append(windows_output)
 
         print(f"\nStats pour {theme_name} ({method}):")
         print(sim_matrix.describe())
 
-        report = compute_graph_metrics(G, df, top_n=10)
+        centrality_options = {}
+        if centrality == 'approx':
+            centrality_options = {'k_samples': centrality_samples, 'epsilon': centrality_epsilon,
+                                  'seed': centrality_seed}
+        metrics_key = content_hash('metrics', graph_key, 10, centrality, centrality_options)
+        with span('centrality', centrality=centrality, **stage) as attrs:
+            attrs['cached'] = cache.has(metrics_key, 'report.json')
+            if attrs['cached']:
+                report = cache.load_json(metrics_key, 'report.json')
+            else:
+                report = compute_graph_metrics(G, df, top_n=10, centrality=centrality, **centrality_options)
+                cache.save_json(metrics_key, 'report.json', report)
         print_report(report, legislature)
+        result['report'] = report
+
+    return result
+
+
+def joint_analysis(legislatures, store=None, output_root="Output"):
+    """
+    Analyse inter-législatures sur la `JointVoteMatrix` : les députés sont
+    suivis par leur identifiant stable (`VoteMatrix.depute_ids`), non par leur
+    slug. Écrit les mandats de chaque identifiant et la stabilité des
+    alliances des réélus entre législatures consécutives.
+    """
+    store = store or VOTE_STORE
+    legislatures = sorted(legislatures)
+    with span('joint', legislatures=legislatures):
+        joint = JointVoteMatrix.from_matrices({leg: store.load(leg) for leg in legislatures}, store.identity)
+        mandates = joint.mandates()
+        mandates = mandates[mandates.any(axis=1)]
+        mandates.insert(0, 'depute', store.identity.label(mandates.index))
+        stability = joint.alliance_stability()
+
+    output_dir = os.path.join(output_root, f"joint_{legislatures[0]}-{legislatures[-1]}")
+    os.makedirs(output_dir, exist_ok=True)
+    mandates_output = os.path.join(output_dir, "mandates.csv")
+    stability_output = os.path.join(output_dir, "alliance_stability.csv")
+    mandates.to_csv(mandates_output)
+    stability.to_csv(stability_output, index=False)
+
+    print(f"\nAnalyse conjointe des législatures {legislatures} :")
+    print(f"{len(mandates)} députés, dont {len(joint.reelected())} ayant siégé dans plusieurs législatures")
+    if len(stability):
+        print(stability.groupby(['from', 'to'])['stability'].describe())
+    return {'outputs': [mandates_output, stability_output]}
 
-if __name__ == "__main__":
 
-    for legislature in [14, 15, 16]:
-        print(f"\n{'='*60}")
-        print(f" RAPPORT D'ANALYSE : LÉGISLATURE {legislature}")
-        print(f"{'='*60}")
-
-        if legislature == 14:
-            print("Note: pour la 14e législature, la classification lit le fichier local `Data/scrutins.xml` (flux distant indisponible).")
-        dict_themes = get_scrutins_by_theme(legislature=legislature)
-
-        for method in ['cosine']:
-                run_full_pipeline(
-                    legislature=legislature, 
-                    method=method, 
-                    k_neighbors=5, 
-                    min_voters=0,
-                    theme_name='Global',
-                    target_ids=None
-                )
-
-        for theme_name, ids in dict_themes.items():
-            
-            if not ids: continue
-            
-            print(f"\n{'-'*60}")
-            print(f" FOCUS THÉMATIQUE : {theme_name}")
-            print(f"{'-'*60}")
-
-            for method in ['cosine']:
-                run_full_pipeline(
-                    legislature=legislature, 
-                    method=method, 
-                    k_neighbors=5, 
-                    min_voters=0,
-                    theme_name=theme_name,
-                    target_ids=ids
-                )
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse des votes de l'Assemblée nationale.")
+    parser.add_argument("--legislatures", type=int, nargs="+", default=[14, 15, 16])
+    parser.add_argument("--methods", nargs="+", default=["cosine"])
+    parser.add_argument("--k-neighbors", type=int, default=5)
+    parser.add_argument("--min-voters", type=int, default=0)
+    parser.add_argument("--sync", action="store_true",
+                        help="Compléter d'abord les CSV existants par les nouveaux scrutins (et ceux en échec).")
+    parser.add_argument("--recheck-last", type=int, default=0,
+                        help="Avec --sync, re-vérifier les N derniers scrutins stockés et remplacer ceux "
+                             "qui ont changé.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Nombre de processus (défaut : nombre de cœurs ; 1 = exécution séquentielle).")
+    parser.add_argument("--pca-axes", choices=["theme", "global"], default="theme",
+                        help="ACP des thèmes : ré-ajustée par thème ou projetée sur les axes de la législature.")
+    parser.add_argument("--layout-seed", type=int, default=0, help="Graine de la disposition du réseau.")
+    parser.add_argument("--warm-start-layout", action="store_true",
+                        help="Disposer le réseau à partir des positions de la législature précédente.")
+    parser.add_argument("--window", type=int, default=None,
+                        help="Taille des fenêtres glissantes de graphes k-NN (désactivées par défaut).")
+    parser.add_argument("--window-unit", choices=["scrutins", "months"], default="scrutins")
+    parser.add_argument("--window-step", type=int, default=1, help="Pas des fenêtres, en scrutins.")
+    parser.add_argument("--similarity-dtype", choices=["float32", "float16", "float64"], default="float32",
+                        help="Précision du stockage de la matrice de similarité.")
+    parser.add_argument("--similarity-top-k", type=int, default=None,
+                        help="Ne conserver que les N plus fortes similarités de chaque député (N >= k).")
+    parser.add_argument("--theme-similarity", action="store_true",
+                        help="Construire aussi un réseau k-NN par thème (similarités déduites des comptages "
+                             "par thème, calculés une seule fois par législature).")
+    parser.add_argument("--centrality", choices=["exact", "approx", "parallel"], default="exact",
+                        help="Calcul de la betweenness : exact, approché par échantillonnage de pivots, ou "
+                             "exact réparti sur plusieurs processus.")
+    parser.add_argument("--centrality-samples", type=int, default=None,
+                        help="Nombre de pivots en mode approché (défaut : déduit de --centrality-epsilon).")
+    parser.add_argument("--centrality-epsilon", type=float, default=0.1,
+                        help="Erreur absolue visée en mode approché.")
+    parser.add_argument("--centrality-seed", type=int, default=0, help="Graine du tirage des pivots.")
+    parser.add_argument("--joint", action="store_true",
+                        help="Analyser aussi les législatures ensemble (mandats et stabilité des alliances des "
+                             "réélus), les députés étant suivis par leur identifiant stable.")
+    parser.add_argument("--render", choices=sorted(PRESETS) + ["none"], default="publication",
+                        help="Préréglage de rendu des figures ; `none` n'écrit que les données (rendu "
+                             "ultérieur avec `python -m src.render`).")
+    parser.add_argument("--figure-format", choices=["png", "svg", "pdf"], default=None)
+    parser.add_argument("--dpi", type=int, default=None)
+    parser.add_argument("--results", default=None, help="Fichier JSON où écrire les résultats structurés.")
+    parser.add_argument("--run-report", default=None,
+                        help="Fichier JSON du rapport d'exécution (durées, CPU, mémoire par étape, "
+                             "compteurs de téléchargement).")
+    parser.add_argument("--profile-stage", default=None,
+                        choices=["fetch", "load", "pivot", "participation", "classify", "theme_grams", "attendance",
+                                 "filter", "pca", "similarity", "knn", "layout", "windows", "centrality", "joint",
+                                 "render"],
+                        help="Étape à profiler avec cProfile (un fichier .prof par exécution de l'étape).")
+    parser.add_argument("--profile-dir", default="profiles", help="Dossier des profils cProfile.")
+    args = parser.parse_args(argv)
+
+    instrument.RECORDER.profile_stage = args.profile_stage
+    instrument.RECORDER.profile_dir = args.profile_dir
+
+    results = run_grid(args.legislatures, methods=args.methods, k_neighbors=args.k_neighbors,
+                       min_voters=args.min_voters, workers=args.workers, sync=args.sync,
+                       recheck_last=args.recheck_last, pca_axes=args.pca_axes,
+                       layout_seed=args.layout_seed, warm_start_layout=args.warm_start_layout,
+                       window=args.window, window_unit=args.window_unit, window_step=args.window_step,
+                       similarity_dtype=args.similarity_dtype, similarity_top_k=args.similarity_top_k,
+                       theme_similarity=args.theme_similarity, centrality=args.centrality,
+                       centrality_samples=args.centrality_samples, centrality_epsilon=args.centrality_epsilon,
+                       centrality_seed=args.centrality_seed)
+    if args.joint:
+        results.append(joint_analysis(args.legislatures))
+
+    if args.render != "none":
+        jobs = [job for result in results for job in result.get('figures', [])]
+        paths = render_figures(jobs, preset=args.render, fmt=args.figure_format, dpi=args.dpi,
+                               workers=args.workers)
+        for job, path in zip(jobs, paths):
+            job['path'] = path
+
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+    if args.run_report:
+        instrument.RECORDER.write_report(args.run_report, settings=vars(args))
+        print(f"Rapport d'exécution écrit dans {args.run_report}")
+    return results
+
+if __name__ == "__main__":
+    main()
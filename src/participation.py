@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class ParticipationIndex:
+    """
+    Index de participation d'une législature, construit une fois à partir de
+    la `VoteMatrix` : qui figure dans quel scrutin, et sous quel groupe.
+
+    - `incidence` (csc, int8) : une ligne par couple (député, groupe), une
+      colonne par scrutin ; 1 si le couple figure dans le scrutin (non-votants
+      compris, comme `VoteMatrix.listed`) ;
+    - `voters` (int32) : nombre de votants de chaque scrutin ;
+    - `group_voters` (int32, groupe x scrutin) : votants de chaque groupe ;
+    - `presences` (int32) : nombre de scrutins de chaque couple (député, groupe).
+
+    Les comptages d'un sous-ensemble de scrutins (un thème) se lisent sur les
+    colonnes correspondantes, sans repasser par les votes. `update` ajoute ou
+    remplace des scrutins en ne traitant que leurs colonnes.
+    """
+
+    def __init__(self, deputes, group_labels, scrutins, pair_depute, pair_group, incidence):
+        self.deputes = pd.Index(deputes, name='depute')
+        self.group_labels = pd.Index(group_labels)
+        self.scrutins = pd.Index(scrutins, name='scrutin_id')
+        self.pair_depute = np.asarray(pair_depute, dtype=np.int32)
+        self.pair_group = np.asarray(pair_group, dtype=np.int32)
+        self.incidence = sparse.csc_array(incidence)
+        self.voters = np.diff(self.incidence.indptr).astype(np.int32)
+        self.group_voters = self._group_voters(self.incidence)
+        self.presences = np.bincount(self.incidence.indices, minlength=len(self.pair_depute)).astype(np.int32)
+
+    @classmethod
+    def from_matrix(cls, votes):
+        """Index d'une `VoteMatrix`, en un seul parcours de ses cellules renseignées."""
+        n_groups = len(votes.group_labels)
+        rows, cols = np.nonzero(votes.listed)
+        pairs, pair_of = np.unique(rows.astype(np.int64) * n_groups + votes.groups[rows, cols], return_inverse=True)
+        incidence = sparse.csc_array((np.ones(len(rows), dtype=np.int8), (pair_of, cols)),
+                                     shape=(len(pairs), votes.shape[1]))
+        return cls(votes.deputes, votes.group_labels, votes.scrutins, pairs // n_groups, pairs % n_groups, incidence)
+
+    def to_arrays(self):
+        """Tableaux sérialisables pour `np.savez` (l'incidence ne contient que des 1)."""
+        return {
+            'deputes': np.asarray(self.deputes, dtype=str),
+            'group_labels': np.asarray(self.group_labels, dtype=str),
+            'scrutins': np.asarray(self.scrutins),
+            'pair_depute': self.pair_depute,
+            'pair_group': self.pair_group,
+            'incidence_indices': self.incidence.indices,
+            'incidence_indptr': self.incidence.indptr,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        shape = (len(arrays['pair_depute']), len(arrays['scrutins']))
+        indices = arrays['incidence_indices']
+        incidence = sparse.csc_array((np.ones(len(indices), dtype=np.int8), indices, arrays['incidence_indptr']),
+                                     shape=shape)
+        return cls(arrays['deputes'], arrays['group_labels'], arrays['scrutins'], arrays['pair_depute'],
+                   arrays['pair_group'], incidence)
+
+    def _group_voters(self, incidence):
+        cols = np.repeat(np.arange(incidence.shape[1]), np.diff(incidence.indptr))
+        flat = self.pair_group[incidence.indices].astype(np.int64) * incidence.shape[1] + cols
+        counts = np.bincount(flat, minlength=len(self.group_labels) * incidence.shape[1])
+        return counts.reshape(len(self.group_labels), incidence.shape[1]).astype(np.int32)
+
+    def _positions(self, scrutin_ids=None):
+        if scrutin_ids is None:
+            return None
+        positions = self.scrutins.get_indexer(pd.Index(scrutin_ids).unique())
+        return np.sort(positions[positions >= 0])
+
+    # --- Requêtes ---
+
+    def voter_counts(self, scrutin_ids=None):
+        """Nombre de votants de chaque scrutin (tous, ou ceux de `scrutin_ids`)."""
+        positions = self._positions(scrutin_ids)
+        if positions is None:
+            return pd.Series(self.voters.astype(np.int64), index=self.scrutins)
+        return pd.Series(self.voters[positions].astype(np.int64), index=self.scrutins[positions])
+
+    def group_counts(self, scrutin_ids=None):
+        """Votants de chaque groupe par scrutin (DataFrame scrutin x groupe)."""
+        positions = self._positions(scrutin_ids)
+        counts = self.group_voters if positions is None else self.group_voters[:, positions]
+        scrutins = self.scrutins if positions is None else self.scrutins[positions]
+        return pd.DataFrame(counts.T, index=scrutins, columns=self.group_labels)
+
+    def pair_presences(self, scrutin_ids=None):
+        """
+        Nombre de scrutins où figure chaque couple (depute, groupe), parmi
+        `scrutin_ids` ; seuls les couples présents au moins une fois sont gardés.
+        """
+        positions = self._positions(scrutin_ids)
+        if positions is None:
+            counts = self.presences
+        else:
+            counts = np.bincount(self.incidence[:, positions].indices, minlength=len(self.pair_depute))
+        pairs = np.flatnonzero(counts)
+        pairs = pairs[np.lexsort((self.pair_group[pairs], self.pair_depute[pairs]))]
+        return pd.DataFrame({
+            'depute': self.deputes[self.pair_depute[pairs]],
+            'groupe': self.group_labels[self.pair_group[pairs]],
+            'presences': counts[pairs].astype(np.int64),
+        })
+
+    def depute_presences(self, scrutin_ids=None):
+        """Nombre de scrutins où figure chaque député, tous groupes confondus."""
+        att = self.pair_presences(scrutin_ids)
+        return att.groupby('depute', sort=False)['presences'].sum()
+
+    # --- Mise à jour ---
+
+    def update(self, votes):
+        """
+        Ajoute les scrutins de la `VoteMatrix` `votes` ; un scrutin déjà indexé
+        est remplacé. Seules les colonnes concernées sont traitées. Si les
+        scrutins étaient rangés par numéro (comme dans une `VoteMatrix`), ils
+        le restent. Retourne l'index.
+        """
+        was_sorted = self.scrutins.is_monotonic_increasing
+        replaced = self.scrutins.isin(votes.scrutins)
+        if replaced.any():
+            self.presences -= np.bincount(self.incidence[:, np.flatnonzero(replaced)].indices,
+                                          minlength=len(self.pair_depute)).astype(np.int32)
+            kept = np.flatnonzero(~replaced)
+            self.incidence = self.incidence[:, kept]
+            self.voters, self.group_voters = self.voters[kept], self.group_voters[:, kept]
+            self.scrutins = self.scrutins[kept]
+
+        # Nouveaux députés et groupes ajoutés en fin de libellés
+        self.deputes = self.deputes.append(votes.deputes.difference(self.deputes, sort=False))
+        self.group_labels = self.group_labels.append(votes.group_labels.difference(self.group_labels, sort=False))
+        depute_code = self.deputes.get_indexer(votes.deputes)
+        group_code = self.group_labels.get_indexer(votes.group_labels)
+
+        rows, cols = np.nonzero(votes.listed)
+        entries = pd.MultiIndex.from_arrays([depute_code[rows], group_code[votes.groups[rows, cols]]])
+        known = pd.MultiIndex.from_arrays([self.pair_depute, self.pair_group])
+        pair_of = known.get_indexer(entries)
+        new_pairs = entries[pair_of < 0].unique()
+        if len(new_pairs):
+            self.pair_depute = np.concatenate([self.pair_depute, new_pairs.get_level_values(0)]).astype(np.int32)
+            self.pair_group = np.concatenate([self.pair_group, new_pairs.get_level_values(1)]).astype(np.int32)
+            self.presences = np.concatenate([self.presences, np.zeros(len(new_pairs), dtype=np.int32)])
+            pair_of = pd.MultiIndex.from_arrays([self.pair_depute, self.pair_group]).get_indexer(entries)
+
+        added = sparse.csc_array((np.ones(len(rows), dtype=np.int8), (pair_of, cols)),
+                                 shape=(len(self.pair_depute), votes.shape[1]))
+        old = self.incidence
+        old = sparse.csc_array((old.data, old.indices, old.indptr), shape=(len(self.pair_depute), old.shape[1]))
+        self.incidence = sparse.hstack([old, added], format='csc')
+        self.voters = np.concatenate([self.voters, np.diff(added.indptr).astype(np.int32)])
+        group_voters = np.zeros((len(self.group_labels), self.group_voters.shape[1]), dtype=np.int32)
+        group_voters[:self.group_voters.shape[0]] = self.group_voters
+        self.group_voters = np.hstack([group_voters, self._group_voters(added)])
+        self.presences += np.bincount(added.indices, minlength=len(self.pair_depute)).astype(np.int32)
+        self.scrutins = self.scrutins.append(votes.scrutins)
+
+        if was_sorted and not self.scrutins.is_monotonic_increasing:
+            order = np.argsort(self.scrutins, kind='stable')
+            self.incidence = self.incidence[:, order]
+            self.voters, self.group_voters = self.voters[order], self.group_voters[:, order]
+            self.scrutins = self.scrutins[order]
+        return self
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.votes import VoteMatrix
+
+
+def _sparse_votes(pivot_votes):
+    """
+    Matrice creuse (float32) des votes pour / contre : les abstentions et les
+    absences valent 0 (comme `fillna(0)`) et ne sont pas stockées.
+    """
+    if isinstance(pivot_votes, VoteMatrix):
+        rows, cols = np.nonzero(pivot_votes.voted & (pivot_votes.codes != 0))
+        values = pivot_votes.codes[rows, cols].astype(np.float32)
+        return sparse.csr_array((values, (rows, cols)), shape=pivot_votes.shape)
+    return sparse.csr_array(np.nan_to_num(np.asarray(pivot_votes, dtype=np.float32)))
+
+
+class PCAModel:
+    """
+    ACP des votes standardisés (équivalent de `StandardScaler` puis `PCA`),
+    ajustée par SVD randomisée sur la matrice creuse des votes, sans jamais
+    matérialiser la matrice centrée-réduite dense.
+
+    - `scrutins` : scrutins (colonnes) sur lesquels l'ACP a été ajustée ;
+    - `mean`, `scale` : moyenne et écart-type de chaque scrutin ;
+    - `components` (k x scrutins), `explained_variance_ratio` : axes et part de variance.
+
+    Un modèle ajusté sur une législature entière peut projeter n'importe quelle
+    sélection de scrutins (un thème) sur ces mêmes axes avec `transform`.
+    """
+
+    def __init__(self, scrutins, mean, scale, components, explained_variance_ratio):
+        self.scrutins = pd.Index(scrutins, name='scrutin_id')
+        self.mean = mean
+        self.scale = scale
+        self.components = components
+        self.explained_variance_ratio = explained_variance_ratio
+
+    @classmethod
+    def fit(cls, pivot_votes, n_components=2, n_oversamples=10, n_iter=7, random_state=0):
+        X = _sparse_votes(pivot_votes)
+        n = X.shape[0]
+
+        # Moyenne et variance par scrutin ; les valeurs étant dans {-1, 0, 1}, X² = |X|
+        mean = np.asarray(X.sum(axis=0), dtype=np.float64).ravel() / n
+        var = np.asarray(abs(X).sum(axis=0), dtype=np.float64).ravel() / n - mean ** 2
+        var = np.clip(var, 0, None)
+        scale = np.sqrt(var)
+        scale[scale == 0] = 1.0
+
+        # A = (X - 1 mean) / scale, appliquée sans être construite
+        def matmul(M):
+            return X @ (M / scale[:, None]) - np.outer(np.ones(n), (mean / scale) @ M)
+
+        def rmatmul(M):
+            return (X.T @ M - np.outer(mean, M.sum(axis=0))) / scale[:, None]
+
+        # SVD randomisée (Halko et al.) avec itérations de puissance
+        rng = np.random.default_rng(random_state)
+        k = min(n_components + n_oversamples, *X.shape)
+        Q, _ = np.linalg.qr(matmul(rng.standard_normal((X.shape[1], k))))
+        for _ in range(n_iter):
+            Q, _ = np.linalg.qr(rmatmul(Q))
+            Q, _ = np.linalg.qr(matmul(Q))
+        _, S, Vt = np.linalg.svd(rmatmul(Q).T, full_matrices=False)
+        S, Vt = S[:n_components], Vt[:n_components]
+
+        # Signe déterministe (comme `PCA`) : plus forte contribution positive
+        signs = np.sign(Vt[np.arange(len(Vt)), np.argmax(np.abs(Vt), axis=1)])
+        signs[signs == 0] = 1.0
+        Vt = Vt * signs[:, None]
+
+        total_variance = n * (var / scale ** 2).sum()
+        ratio = S ** 2 / total_variance if total_variance else np.zeros_like(S)
+        return cls(pivot_votes.columns, mean, scale, Vt, ratio)
+
+    def transform(self, pivot_votes):
+        """
+        Coordonnées des députés de `pivot_votes` sur les axes du modèle. Seuls les
+        scrutins communs au modèle comptent ; les autres sont ignorés.
+        """
+        positions = self.scrutins.get_indexer(pivot_votes.columns)
+        known = positions >= 0
+        X = _sparse_votes(pivot_votes)[:, np.flatnonzero(known)]
+        cols = positions[known]
+
+        weights = self.components[:, cols].T / self.scale[cols, None]
+        coords = X @ weights - (self.mean[cols] @ weights)
+        return pd.DataFrame(coords, index=pivot_votes.index,
+                            columns=[f"PC{i + 1}" for i in range(coords.shape[1])])
+
+    def to_arrays(self):
+        return {
+            'scrutins': np.asarray(self.scrutins),
+            'mean': self.mean,
+            'scale': self.scale,
+            'components': self.components,
+            'explained_variance_ratio': self.explained_variance_ratio,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['scrutins'], arrays['mean'], arrays['scale'], arrays['components'],
+                   arrays['explained_variance_ratio'])
@@ -1,42 +1,127 @@
+import math
+import os
 import networkx as nx
+import numpy as np
 import pandas as pd
+from scipy import sparse
+from concurrent.futures import ProcessPoolExecutor
 
-def compute_graph_metrics(G, df_meta, top_n=5):
+
+def _distance(u, v, d):
+    """Distance d'une arête : inverse de la similarité (plus proches = plus courts)."""
+    return 1.0 / (d['weight'] + 1e-6)
+
+
+def _betweenness_chunk(G, sources):
+    # Contributions brutes (paires ordonnées) des chemins issus de `sources`
+    partial = nx.betweenness_centrality_subset(G, sources, list(G), normalized=False, weight=_distance)
+    return {node: 2 * value for node, value in partial.items()}
+
+
+def _parallel_betweenness(G, workers=None):
     """
-    Calcule les métriques globales et les leaders par famille politique.
+    Betweenness exacte (normalisée) répartie par paquets de sources sur un pool
+    de processus ; le résultat est identique à `nx.betweenness_centrality`.
+    """
+    workers = workers or os.cpu_count() or 1
+    nodes = list(G)
+    chunks = [nodes[i::workers] for i in range(workers) if nodes[i::workers]]
+
+    betweenness = dict.fromkeys(nodes, 0.0)
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        for partial in executor.map(_betweenness_chunk, [G] * len(chunks), chunks):
+            for node, value in partial.items():
+                betweenness[node] += value
+
+    n = len(nodes)
+    scale = 1.0 / ((n - 1) * (n - 2)) if n > 2 else 1.0
+    return {node: value * scale for node, value in betweenness.items()}
+
+
+def compute_betweenness(G, mode='exact', k_samples=None, epsilon=0.1, delta=0.1, seed=None, workers=None):
+    """
+    Betweenness pondérée par la distance 1 / similarité, sans modifier `G`.
+
+    - 'exact'    : `nx.betweenness_centrality` (Brandes, O(VE log V)).
+    - 'approx'   : estimation à partir de `k_samples` pivots tirés au hasard
+                   (graine `seed`). Par défaut, k est choisi pour une erreur
+                   absolue d'au plus `epsilon` avec probabilité 1 - `delta`.
+    - 'parallel' : résultat exact, sources réparties sur `workers` processus.
+
+    Retourne (betweenness, infos) où infos décrit le mode effectivement utilisé.
     """
-    for u, v, d in G.edges(data=True):
-        G[u][v]['distance'] = 1.0 / (d['weight'] + 1e-6)
+    n = G.number_of_nodes()
+    infos = {'mode': mode}
+
+    if mode == 'approx':
+        if k_samples is None:
+            k_samples = math.ceil(math.log(2 * max(n, 1) / delta) / (2 * epsilon ** 2))
+            infos.update(epsilon=epsilon, delta=delta)
+        k_samples = min(k_samples, n)
+        infos.update(k=k_samples, seed=seed)
+        if k_samples < n:
+            return nx.betweenness_centrality(G, k=k_samples, seed=seed, weight=_distance), infos
+        infos['mode'] = 'exact'
+        return nx.betweenness_centrality(G, weight=_distance), infos
+
+    if mode == 'parallel':
+        infos['workers'] = workers or os.cpu_count()
+        return _parallel_betweenness(G, workers), infos
 
-    betweenness = nx.betweenness_centrality(G, weight='distance')
-    degree_weighted = dict(G.degree(weight='weight'))
+    if mode != 'exact':
+        raise ValueError(f"Mode de centralité inconnu : {mode}")
+    return nx.betweenness_centrality(G, weight=_distance), infos
+
+
+def _argmax_by_group(scores, labels):
+    """
+    Pour chaque groupe (étiquette >= 0), indice du nœud de score maximal ;
+    à égalité, le premier dans l'ordre des nœuds.
+    """
+    idx = np.flatnonzero(labels >= 0)
+    order = idx[np.lexsort((idx, -scores[idx], labels[idx]))]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = labels[order][1:] != labels[order][:-1]
+    return dict(zip(labels[order][first].tolist(), order[first].tolist()))
+
+
+def compute_graph_metrics(G, df_meta, top_n=5, centrality='exact', **centrality_options):
+    """
+    Calcule les métriques globales et les leaders par famille politique.
+
+    `centrality` et `centrality_options` sont transmis à `compute_betweenness` ;
+    le mode retenu est indiqué dans le rapport (clé 'centrality').
+    """
+    betweenness, centrality_infos = compute_betweenness(G, mode=centrality, **centrality_options)
 
     depute_to_group = df_meta.groupby('depute')['groupe'].last().to_dict()
     all_groups = sorted(list(set(depute_to_group.values())))
 
-    influence_intra = {}
-    influence_global = {}
-
-    for group in all_groups:
-        members = [n for n in G.nodes() if depute_to_group.get(n) == group]
-        if not members: continue
-
-        # --- ANALYSE GLOBALE : Le plus influent du groupe sur TOUT le graphe ---
-        leader_global = max(members, key=lambda m: degree_weighted.get(m, 0))
-        influence_global[group] = {
-            'nom': leader_global, 
-            'score': round(degree_weighted[leader_global], 2)
-        }
-
-        # --- ANALYSE INTRA : Le plus influent au sein de son propre groupe ---
-        if len(members) > 1:
-            subgraph = G.subgraph(members)
-            intra_degrees = dict(subgraph.degree(weight='weight'))
-            leader_intra = max(intra_degrees, key=lambda m: intra_degrees[m])
-            influence_intra[group] = {
-                'nom': leader_intra, 
-                'score': round(intra_degrees[leader_intra], 2)
-            }
+    # Adjacence creuse + étiquettes de groupe entières : un seul passage sur les arêtes
+    nodes = list(G.nodes())
+    if nodes:
+        adjacency = nx.to_scipy_sparse_array(G, nodelist=nodes, weight='weight', format='coo')
+    else:
+        adjacency = sparse.coo_array((0, 0))
+    labels = pd.Categorical([depute_to_group.get(n) for n in nodes], categories=all_groups).codes
+    same_group = (labels[adjacency.row] == labels[adjacency.col]) & (labels[adjacency.row] >= 0)
+
+    global_scores = np.bincount(adjacency.row, weights=adjacency.data, minlength=len(nodes))
+    intra_scores = np.bincount(adjacency.row[same_group], weights=adjacency.data[same_group],
+                               minlength=len(nodes))
+    group_sizes = np.bincount(labels[labels >= 0], minlength=len(all_groups))
+
+    # --- ANALYSE GLOBALE : Le plus influent du groupe sur TOUT le graphe ---
+    influence_global = {
+        all_groups[g]: {'nom': nodes[i], 'score': round(float(global_scores[i]), 2)}
+        for g, i in _argmax_by_group(global_scores, labels).items()
+    }
+
+    # --- ANALYSE INTRA : Le plus influent au sein de son propre groupe ---
+    influence_intra = {
+        all_groups[g]: {'nom': nodes[i], 'score': round(float(intra_scores[i]), 2)}
+        for g, i in _argmax_by_group(intra_scores, labels).items() if group_sizes[g] > 1
+    }
 
     def get_top_entities(metric_dict, n=top_n):
         sorted_items = sorted(metric_dict.items(), key=lambda x: x[1], reverse=True)[:n]
@@ -44,8 +129,9 @@ def compute_graph_metrics(G, df_meta, top_n=5):
                 for name, score in sorted_items]
 
     report = {
+        'centrality': centrality_infos,
         'pivots': get_top_entities(betweenness),
-        'piliers': get_top_entities(degree_weighted),
+        'piliers': get_top_entities(dict(zip(nodes, global_scores.tolist()))),
         'intra_leaders': influence_intra,
         'global_leaders': influence_global
     }
@@ -54,7 +140,9 @@ def compute_graph_metrics(G, df_meta, top_n=5):
 
 def print_report(report, legislature):
 
-    print(f"\n TOP PIVOTS (Betweenness) :")
+    centrality = report.get('centrality', {'mode': 'exact'})
+    details = ", ".join(f"{k}={v}" for k, v in centrality.items() if k != 'mode' and v is not None)
+    print(f"\n TOP PIVOTS (Betweenness {centrality['mode']}{' : ' + details if details else ''}) :")
     for i, d in enumerate(report['pivots'], 1):
         print(f"{i}. {d['nom']:25} ({d['groupe']:6}) - Score: {d['score']}")
 
@@ -0,0 +1,238 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import matplotlib
+import matplotlib.pyplot as plt
+import seaborn as sns # type: ignore
+from matplotlib.collections import LineCollection
+from src import instrument
+from src.cache import ArtifactCache, content_hash
+from src.config import PARTY_COLORS, DEFAULT_COLOR
+
+# Préréglages de rendu : brouillon rapide ou qualité publication (rendu historique)
+PRESETS = {
+    'draft': {'format': 'png', 'dpi': 100},
+    'publication': {'format': 'png', 'dpi': 300},
+}
+
+
+# --- Figures : chacune ne dépend que de données déjà calculées ---
+
+def render_voter_histogram(voters_per_scrutin, theme_name, output_path, dpi=100):
+    """Histogramme de la participation (nombre de votants par scrutin)."""
+    plt.figure(figsize=(10, 6))
+    sns.histplot(voters_per_scrutin, bins=30, kde=True, color='skyblue')
+
+    plt.title(f"Distribution de la participation : {theme_name}")
+    plt.xlabel("Nombre de votants")
+    plt.ylabel("Nombre de scrutins")
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    plt.savefig(output_path, dpi=dpi)
+    plt.close()
+
+
+def render_group_counts(group_counts, legislature, output_path, dpi=300):
+    """Diagramme en barres du nombre de députés par groupe."""
+    colors = [PARTY_COLORS.get(g, DEFAULT_COLOR) for g in group_counts.index]
+
+    plt.figure(figsize=(12, 7))
+    bars = plt.bar(group_counts.index, group_counts.values, color=colors, edgecolor='black', alpha=0.8)
+
+    for bar in bars:
+        yval = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width()/2, yval + 2, yval, ha='center', va='bottom', fontweight='bold')
+
+    plt.title(f"Répartition des députés par groupe parlementaire (Législature {legislature})", fontsize=14)
+    plt.ylabel("Nombre de députés")
+    plt.xlabel("Groupes Parlementaires")
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+    plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+
+
+def render_pca(df_pca, var_exp, theme_name, output_path, projected=False, dpi=300):
+    """Nuage PC1 x PC2 des députés (colonnes depute, groupe, PC1, PC2)."""
+    plt.figure(figsize=(12, 8))
+
+    for groupe in df_pca['groupe'].unique():
+        mask = df_pca['groupe'] == groupe
+        plt.scatter(
+            df_pca.loc[mask, 'PC1'],
+            df_pca.loc[mask, 'PC2'],
+            label=groupe,
+            color=PARTY_COLORS.get(groupe, '#808080'),
+            alpha=0.7,
+            edgecolors='white',
+            linewidths=0.5,
+            s=40
+        )
+
+    axes = " (axes de la législature)" if projected else ""
+    plt.title(f"Analyse en Composantes Principales - Thème : {theme_name}{axes}", fontsize=14)
+    plt.xlabel(f"PC1 : Clivage principal ({var_exp[0]:.1%} de variance)", fontsize=11)
+    plt.ylabel(f"PC2 : Clivage secondaire ({var_exp[1]:.1%} de variance)", fontsize=11)
+
+    plt.legend(title="Groupes Politiques", bbox_to_anchor=(1.05, 1), loc='upper left')
+    plt.grid(True, linestyle='--', alpha=0.3)
+    plt.axhline(0, color='black', linewidth=0.8, alpha=0.5)
+    plt.axvline(0, color='black', linewidth=0.8, alpha=0.5)
+
+    plt.tight_layout()
+    plt.savefig(output_path, dpi=dpi)
+    plt.close()
+
+
+def render_network(nodes, edges, legislature, k_neighbors, output_path, method='cosine', dpi=300,
+                   theme_name="Global"):
+    """
+    Réseau k-NN : `nodes` (depute, groupe, x, y) et `edges` (source, target).
+    Toutes les arêtes forment une seule `LineCollection` et tous les sommets
+    un seul nuage de points, au lieu d'un artiste par élément.
+    """
+    position = {d: i for i, d in enumerate(nodes['depute'])}
+    xy = nodes[['x', 'y']].to_numpy(dtype=float)
+    src = edges['source'].map(position).to_numpy()
+    dst = edges['target'].map(position).to_numpy()
+    segments = np.stack([xy[src], xy[dst]], axis=1) if len(edges) else np.empty((0, 2, 2))
+
+    fig, ax = plt.subplots(figsize=(15, 12))
+    ax.add_collection(LineCollection(segments, colors='gray', alpha=0.1, linewidths=1.0, zorder=1))
+    colors = [PARTY_COLORS.get(g, '#808080') for g in nodes['groupe'].fillna('NI')]
+    ax.scatter(xy[:, 0], xy[:, 1], s=50, c=colors, alpha=0.8, zorder=2)
+    ax.autoscale_view()
+
+    theme = "" if theme_name == "Global" else f" - Thème : {theme_name}"
+    ax.set_title(f"Réseau des Députés - Législature {legislature}{theme}\n(k-NN {method}, k={k_neighbors})",
+                 fontsize=15)
+    ax.axis('off')
+
+    fig.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+
+
+# --- Tâches de rendu différé ---
+
+def figure_job(kind, output_stem, inputs, **params):
+    """
+    Description d'une figure à produire : son type, le chemin de sortie sans
+    extension, les fichiers de données qu'elle lit et ses paramètres.
+    """
+    return {'kind': kind, 'output': output_stem, 'inputs': inputs, 'params': params}
+
+
+def _render_job(job, path, dpi):
+    inputs, params = job['inputs'], job['params']
+    if job['kind'] == 'voters':
+        voters = pd.read_csv(inputs['data'])['votants']
+        render_voter_histogram(voters, params['theme_name'], path, dpi=dpi)
+    elif job['kind'] == 'groups':
+        counts = pd.read_csv(inputs['data']).set_index('groupe')['deputes']
+        render_group_counts(counts, params['legislature'], path, dpi=dpi)
+    elif job['kind'] == 'pca':
+        render_pca(pd.read_csv(inputs['data']), params['explained_variance'], params['theme_name'], path,
+                   projected=params.get('projected', False), dpi=dpi)
+    elif job['kind'] == 'network':
+        render_network(pd.read_csv(inputs['nodes']), pd.read_csv(inputs['edges']), params['legislature'],
+                       params['k_neighbors'], path, method=params.get('method', 'cosine'), dpi=dpi,
+                       theme_name=params.get('theme_name', "Global"))
+    else:
+        raise ValueError(f"Type de figure inconnu : {job['kind']}")
+
+
+def _file_digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render_figure(job, fmt='png', dpi=300, cache=None):
+    """
+    Produit la figure d'une tâche et retourne son chemin. Le résultat est mis
+    en cache par empreinte des données lues, des paramètres, du format et de la
+    résolution : une figure inchangée est simplement recopiée.
+    """
+    cache = cache or ArtifactCache()
+    path = f"{job['output']}.{fmt}"
+    name = f"figure.{fmt}"
+    key = content_hash('figure', job['kind'], job['params'], fmt, dpi,
+                       {role: _file_digest(p) for role, p in sorted(job['inputs'].items())})
+    with instrument.span('render', kind=job['kind'], output=path) as attrs:
+        attrs['cached'] = cache.restore_file(key, name, path)
+        if not attrs['cached']:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            _render_job(job, path, dpi)
+            cache.save_file(key, name, path)
+    return path
+
+
+def _init_worker(profile_stage=None, profile_dir="."):
+    matplotlib.use("Agg")
+    # Un processus créé par fork hérite des mesures du parent : on repart de zéro
+    instrument.RECORDER.reset()
+    instrument.RECORDER.profile_stage = profile_stage
+    instrument.RECORDER.profile_dir = profile_dir
+
+
+def _render_args(args):
+    return render_figure(*args)
+
+
+def _render_in_worker(args):
+    # Les mesures du processus de rendu sont renvoyées avec le chemin produit
+    return _render_args(args), instrument.RECORDER.collect()
+
+
+def render_figures(jobs, preset='publication', fmt=None, dpi=None, workers=None):
+    """
+    Rend un lot de figures avec le préréglage `preset` (`fmt` et `dpi` le
+    surchargent), dans un pool de `workers` processus (1 = séquentiel).
+    Retourne les chemins produits, dans l'ordre des tâches.
+    """
+    settings = PRESETS[preset]
+    fmt = fmt or settings['format']
+    dpi = dpi or settings['dpi']
+    workers = workers or os.cpu_count() or 1
+
+    args = [(job, fmt, dpi) for job in jobs]
+    if workers == 1 or len(jobs) <= 1:
+        matplotlib.use("Agg")
+        paths = [_render_args(a) for a in args]
+    else:
+        recorder = instrument.RECORDER
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(recorder.profile_stage, recorder.profile_dir)) as executor:
+            paths = []
+            for path, snapshot in executor.map(_render_in_worker, args):
+                recorder.merge(snapshot)
+                paths.append(path)
+
+    for path in paths:
+        print(f"Figure générée : {path}")
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rendu différé des figures d'une analyse.")
+    parser.add_argument("results", help="Fichier JSON de résultats produit par `src.main --results`.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="publication")
+    parser.add_argument("--format", dest="fmt", choices=["png", "svg", "pdf"], default=None)
+    parser.add_argument("--dpi", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    with open(args.results, encoding="utf-8") as f:
+        results = json.load(f)
+    jobs = [job for result in results for job in result.get('figures', [])]
+    return render_figures(jobs, preset=args.preset, fmt=args.fmt, dpi=args.dpi, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+from src import instrument
+
+
+def _init_worker(profile_stage=None, profile_dir="."):
+    # Rendu sans affichage dans les processus de calcul
+    import matplotlib
+    matplotlib.use("Agg")
+    # Un processus créé par fork hérite des mesures du parent : on repart de zéro
+    instrument.RECORDER.reset()
+    instrument.RECORDER.profile_stage = profile_stage
+    instrument.RECORDER.profile_dir = profile_dir
+
+
+def _in_worker(func, arg):
+    # Les mesures du processus sont renvoyées avec le résultat, pour le rapport d'exécution
+    return func(arg), instrument.RECORDER.collect()
+
+
+def prepare_legislature(legislature, methods=(), min_voters=0, theme_similarity=False, sync=False,
+                        recheck_last=0):
+    """
+    Étape amont d'une législature : charge (ou télécharge) les votes, écrit la
+    matrice et l'index de participation en cache sur disque (mis à jour ici
+    après une synchronisation) et classe les scrutins par thème. Avec `sync`,
+    le CSV est d'abord mis à jour (`fetcher.sync`, en re-vérifiant les
+    `recheck_last` derniers scrutins) ; c'est la seule étape qui télécharge. Avec
+    `theme_similarity`, les comptages par thème de chaque méthode
+    (`legislature_theme_grams`) sont aussi calculés ici, une seule fois, avant
+    que les tâches de la législature ne soient lancées en parallèle. Les tâches
+    d'analyse de la législature n'en dépendent que par ces caches.
+    """
+    from src.classification import get_scrutins_by_theme
+    from src.main import VOTE_STORE, legislature_theme_grams
+
+    print(f"\n{'='*60}")
+    print(f" RAPPORT D'ANALYSE : LÉGISLATURE {legislature}")
+    print(f"{'='*60}")
+
+    if legislature == 14:
+        print("Note: pour la 14e législature, la classification lit le fichier local `Data/scrutins.xml` (flux distant indisponible).")
+
+    VOTE_STORE.load(legislature, sync=sync, recheck_last=recheck_last)
+    VOTE_STORE.participation(legislature)
+    with instrument.span('classify', legislature=legislature):
+        themes = get_scrutins_by_theme(legislature=legislature)
+    if theme_similarity:
+        for method in methods:
+            with instrument.span('theme_grams', legislature=legislature, method=method):
+                legislature_theme_grams(legislature, method, min_voters, themes=themes)
+    return themes
+
+
+def run_task(task):
+    """
+    Exécute une tâche d'analyse (législature, thème, méthode). Les erreurs sont
+    rapportées dans le résultat plutôt que propagées, pour ne pas interrompre
+    le reste de la grille.
+    """
+    from src.main import run_full_pipeline
+
+    if task['theme_name'] != 'Global':
+        print(f"\n{'-'*60}")
+        print(f" FOCUS THÉMATIQUE : {task['theme_name']} (législature {task['legislature']})")
+        print(f"{'-'*60}")
+
+    try:
+        with instrument.span('task', legislature=task['legislature'], theme=task['theme_name'],
+                             method=task['method']):
+            return run_full_pipeline(**task)
+    except Exception as e:
+        return {'legislature': task['legislature'], 'theme': task['theme_name'], 'method': task['method'],
+                'status': 'error', 'error': repr(e), 'traceback': traceback.format_exc()}
+
+
+def build_tasks(legislature, themes, methods, k_neighbors, min_voters, **options):
+    """
+    Tâches d'une législature : Global puis chaque thème non vide, pour chaque
+    méthode. `options` est transmis tel quel à `run_full_pipeline`.
+    """
+    grid = [('Global', None)] + [(name, ids) for name, ids in themes.items() if ids]
+    return [
+        {'legislature': legislature, 'method': method, 'k_neighbors': k_neighbors,
+         'min_voters': min_voters, 'theme_name': name, 'target_ids': ids, **options}
+        for name, ids in grid for method in methods
+    ]
+
+
+def run_grid(legislatures, methods=('cosine',), k_neighbors=5, min_voters=0, workers=None, sync=False,
+             recheck_last=0, **options):
+    """
+    Exécute la grille législature x thème x méthode ; `options` (axes de l'ACP,
+    disposition du réseau...) est transmis à `run_full_pipeline`. `sync` et
+    `recheck_last` sont transmis à `prepare_legislature`.
+
+    Chaque législature passe d'abord par `prepare_legislature` ; dès qu'elle est
+    prête, ses tâches d'analyse sont soumises au pool de `workers` processus
+    (par défaut un par cœur), sans attendre les autres législatures. Chaque
+    processus garde en mémoire les votes des législatures qu'il a déjà chargées.
+    Les mesures d'exécution des processus sont regroupées dans `instrument.RECORDER`.
+    Retourne la liste des résultats de `run_full_pipeline`, dans l'ordre de la grille.
+    """
+    workers = workers or os.cpu_count() or 1
+    prepare = partial(prepare_legislature, methods=list(methods), min_voters=min_voters,
+                      theme_similarity=options.get('theme_similarity', False), sync=sync,
+                      recheck_last=recheck_last)
+
+    if workers == 1:
+        out = []
+        for legislature in legislatures:
+            try:
+                themes = prepare(legislature)
+            except Exception as e:
+                out.append(_prepare_error(legislature, e))
+                continue
+            for task in build_tasks(legislature, themes, methods, k_neighbors, min_voters, **options):
+                out.append(run_task(task))
+        return out
+
+    results = {}
+    order = []
+    recorder = instrument.RECORDER
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(recorder.profile_stage, recorder.profile_dir)) as executor:
+        pending = {executor.submit(_in_worker, prepare, leg): ('prepare', leg)
+                   for leg in legislatures}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, payload = pending.pop(future)
+                if kind == 'prepare':
+                    try:
+                        themes, snapshot = future.result()
+                        recorder.merge(snapshot)
+                    except Exception as e:
+                        results[(payload, None, None)] = _prepare_error(payload, e)
+                        order.append((payload, [(payload, None, None)]))
+                        continue
+                    tasks = build_tasks(payload, themes, methods, k_neighbors, min_voters, **options)
+                    for task in tasks:
+                        pending[executor.submit(_in_worker, run_task, task)] = ('task', task)
+                    order.append((payload, [_task_key(t) for t in tasks]))
+                else:
+                    results[_task_key(payload)], snapshot = future.result()
+                    recorder.merge(snapshot)
+
+    by_legislature = dict(order)
+    return [results[key] for leg in legislatures for key in by_legislature.get(leg, [])]
+
+
+def _prepare_error(legislature, error):
+    print(f"Législature {legislature} ignorée : {error!r}")
+    return {'legislature': legislature, 'theme': None, 'method': None, 'status': 'error', 'error': repr(error)}
+
+
+def _task_key(task):
+    return (task['legislature'], task['theme_name'], task['method'])
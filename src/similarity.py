@@ -3,11 +3,24 @@ import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from src.config import MAP_VOTE
 from sklearn.metrics import jaccard_score
+from src.votes import VoteMatrix
+from src.classification import AUTRES
 
-def filter_by_voters(df, min_voters):
+# Nombre minimal de scrutins en commun pour comparer deux députés
+MIN_COMMUN = 5
+
+def filter_by_voters(df, min_voters, participation=None):
     """
     Ne conserve que les scrutins ayant reçu au moins 'min_voters' votes.
+    Accepte le tableau long des votes ou une `VoteMatrix` ; pour une matrice,
+    les comptages sont lus dans `participation` (`ParticipationIndex`) si fourni.
     """
+    if isinstance(df, VoteMatrix):
+        counts = participation.voter_counts(df.columns) if participation is not None else df.voter_counts()
+        valid_ids = counts[counts >= min_voters].index
+        print(f"Filtrage des scrutins : {len(valid_ids)} scrutins analysés (plus de {min_voters} votants).")
+        return df.take(valid_ids)
+
     counts = df.groupby('scrutin_id')['depute'].count()
     valid_ids = counts[counts >= min_voters].index
     df_filtered = df[df['scrutin_id'].isin(valid_ids)].copy()
@@ -15,65 +28,360 @@ def filter_by_voters(df, min_voters):
     return df_filtered
 
 
-def compute_similarity(pivot_df, method='cosine'):
-    min_commun = 5
+def _values_and_presence(pivot_df):
+    """
+    Valeurs numériques et masque des votes exprimés, pour un pivot flottant
+    (NaN = pas de vote) comme pour une `VoteMatrix` (codes int8).
+    """
+    if isinstance(pivot_df, VoteMatrix):
+        return pivot_df.codes, pivot_df.voted
+    data = pivot_df.values if isinstance(pivot_df, pd.DataFrame) else np.asarray(pivot_df, dtype=float)
+    return data, ~np.isnan(data)
+
+
+def compute_similarity(pivot_df, method='cosine', block_size=256):
+    """
+    Matrice de similarité entre députés (DataFrame n x n). `pivot_df` est le
+    pivot flottant des votes ou une `VoteMatrix`. Hors 'cosine', les paires
+    ayant moins de `MIN_COMMUN` scrutins en commun ne sont pas comparées.
+    """
+    min_commun = MIN_COMMUN
 
     if method == 'cosine':
-        avg = pivot_df.mean(axis=1)
-        filled_df = pivot_df.fillna(0)
-        sim_matrix = cosine_similarity(filled_df)
+        values, present = _values_and_presence(pivot_df)
+        filled = np.where(present, values, 0).astype(np.float64)
+        sim_matrix = cosine_similarity(filled)
         return pd.DataFrame(sim_matrix, index=pivot_df.index, columns=pivot_df.index)
 
     elif method == 'correlation':
-        return pivot_df.T.corr(method='pearson')
-
-
-    elif method == 'jaccard':
-        data = pivot_df.values
-        n_deputes = data.shape[0]
-        sim_matrix = np.eye(n_deputes)
-
-        for i in range(n_deputes):
-            for j in range(i + 1, n_deputes):
-                # Intersection : Ils ont voté la même chose ET les deux ont voté
-                matches = np.sum((data[i] == data[j]) & ~np.isnan(data[i]) & ~np.isnan(data[j]))
-                
-                # Union : Nombre de scrutins où i OU j a voté
-                union = np.sum(~np.isnan(data[i]) | ~np.isnan(data[j]))
-                
-                if union < min_commun:
-                    score = 0
-                else:
-                    score = matches / union
-                
-                sim_matrix[i, j] = sim_matrix[j, i] = score
-        
+        values, present = _values_and_presence(pivot_df)
+        sim_matrix = np.empty((len(pivot_df), len(pivot_df)))
+        for start, stop, block in _iter_correlation_blocks(values, present, min_commun, block_size):
+            sim_matrix[start:stop] = block
         return pd.DataFrame(sim_matrix, index=pivot_df.index, columns=pivot_df.index)
 
-
-    elif method == 'agreement_weighted':
-        data = pivot_df.values 
-        n_deputes = data.shape[0]
-        sim_matrix = np.eye(n_deputes)
-
-        for i in range(n_deputes):
-            for j in range(i + 1, n_deputes):
-                # Masque : les deux députés ont voté ce scrutin
-                mask = ~np.isnan(data[i]) & ~np.isnan(data[j])
-                presence_commune = np.sum(mask)
-                
-                if presence_commune < min_commun:
-                    score = 0
-                else:
-                    # Accords : votes identiques où les deux sont présents
-                    accords = np.sum(data[i][mask] == data[j][mask])
-                    score = accords / presence_commune
-                
-                sim_matrix[i, j] = sim_matrix[j, i] = score
-        
+    elif method in ('jaccard', 'agreement_weighted'):
+        values, present = _values_and_presence(pivot_df)
+        sim_matrix = np.empty((len(pivot_df), len(pivot_df)))
+        for start, stop, block in _iter_agreement_blocks(values, present, method, min_commun, block_size):
+            sim_matrix[start:stop] = block
         return pd.DataFrame(sim_matrix, index=pivot_df.index, columns=pivot_df.index)
 
 
+def iter_similarity_blocks(pivot_df, method='cosine', block_size=256):
+    """
+    Produit la matrice de similarité par blocs de lignes (start, stop, bloc),
+    sans jamais matérialiser la matrice n x n complète.
+    """
+    values, present = _values_and_presence(pivot_df)
+
+    if method == 'cosine':
+        yield from _iter_cosine_blocks(values, present, block_size)
+    elif method in ('jaccard', 'agreement_weighted'):
+        yield from _iter_agreement_blocks(values, present, method, MIN_COMMUN, block_size)
+    elif method == 'correlation':
+        yield from _iter_correlation_blocks(values, present, MIN_COMMUN, block_size)
+    else:
+        raise ValueError(f"Méthode de similarité inconnue : {method}")
+
+
+def _iter_cosine_blocks(values, present, block_size):
+    """
+    Similarité cosinus par blocs, les absences comptant pour 0 (comme
+    `cosine_similarity` sur `fillna(0)` : un député sans vote a une similarité nulle).
+    """
+    filled = np.where(present, values, 0).astype(np.float64)
+    norms = np.linalg.norm(filled, axis=1)
+    norms[norms == 0] = 1.0
+    normalized = filled / norms[:, None]
+
+    for start in range(0, len(filled), block_size):
+        stop = min(start + block_size, len(filled))
+        yield start, stop, normalized[start:stop] @ normalized.T
+
+
+def _iter_correlation_blocks(values, present, min_commun, block_size):
+    """
+    Corrélation de Pearson sur les scrutins votés en commun (comme
+    `DataFrame.corr(min_periods=min_commun)` sur le pivot transposé), par blocs.
+
+    Pour chaque paire, les sommes sur les scrutins communs (effectif, sommes,
+    sommes des carrés et des produits) sont des produits matriciels entre
+    valeurs (absences à 0), carrés et masques de présence. Ces sommes étant
+    entières, covariance et variances sont calculées sans erreur d'arrondi :
+    une variance nulle (votes constants sur les scrutins communs) donne NaN,
+    comme un nombre de scrutins communs inférieur à `min_commun`.
+    """
+    filled = np.where(present, values, 0).astype(np.float64)
+    squares = filled * filled
+    presence = present.astype(np.float64)
+
+    n_deputes = filled.shape[0]
+    for start in range(0, n_deputes, block_size):
+        stop = min(start + block_size, n_deputes)
+        x, x2, p = filled[start:stop], squares[start:stop], presence[start:stop]
+
+        yield start, stop, _correlation_from_sums(x @ filled.T, x @ presence.T, p @ filled.T, x2 @ presence.T,
+                                                  p @ squares.T, p @ presence.T, min_commun)
+
+
+def _correlation_from_sums(sum_xy, sum_x, sum_y, sum_xx, sum_yy, commun, min_commun):
+    """Corrélation de Pearson à partir des sommes sur les scrutins communs de chaque paire."""
+    cov = commun * sum_xy - sum_x * sum_y
+    var = (commun * sum_xx - sum_x ** 2) * (commun * sum_yy - sum_y ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        block = np.clip(cov / np.sqrt(var), -1.0, 1.0)
+    block[(commun < max(min_commun, 1)) | (var <= 0)] = np.nan
+    return block
+
+
+def _iter_agreement_blocks(data, present, method, min_commun, block_size):
+    """
+    Calcule les similarités 'jaccard' / 'agreement_weighted' par blocs de lignes.
+
+    Chaque position de vote est encodée en one-hot : le produit matriciel des
+    encodages donne le nombre d'accords, celui des masques de présence le
+    nombre de scrutins votés en commun.
+    """
+    positions = np.unique(data[present])
+
+    # Encodage one-hot (une colonne par couple scrutin x position)
+    one_hot = np.hstack([(data == v) & present for v in positions] or [present[:, :0]]).astype(np.float32)
+    presence = present.astype(np.float32)
+    n_votes = presence.sum(axis=1)
+
+    n_deputes = data.shape[0]
+    for start in range(0, n_deputes, block_size):
+        stop = min(start + block_size, n_deputes)
+
+        # Accords : votes identiques où les deux sont présents
+        matches = (one_hot[start:stop] @ one_hot.T).astype(np.float64)
+        # Présence commune : les deux députés ont voté ce scrutin
+        commun = (presence[start:stop] @ presence.T).astype(np.float64)
+
+        yield start, stop, _agreement_from_counts(matches, commun, n_votes[start:stop], n_votes,
+                                                  method, min_commun, start)
+
+
+def _agreement_from_counts(matches, commun, n_rows, n_cols, method, min_commun, start=0):
+    """
+    Similarité 'jaccard' / 'agreement_weighted' à partir des comptages d'accords
+    et de présences communes (lignes [start, start + len(n_rows)) de la matrice).
+    """
+    if method == 'jaccard':
+        # Union : Nombre de scrutins où i OU j a voté
+        denom = n_rows[:, None] + n_cols[None, :] - commun
+    else:
+        denom = commun
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        block = np.where(denom < min_commun, 0.0, matches / denom)
+
+    rows = np.arange(start, start + len(n_rows))
+    block[rows - start, rows] = 1.0
+    return block
+
+
+def _window_bounds(n_scrutins, window, step, dates=None):
+    """
+    Fenêtres glissantes [start, stop) sur des scrutins rangés chronologiquement.
+
+    Sans `dates`, une fenêtre compte `window` scrutins consécutifs ; avec
+    `dates` (Timestamp de chaque scrutin, croissants), elle couvre les
+    `window` mois précédant son dernier scrutin. Les fenêtres avancent de
+    `step` scrutins ; seules les fenêtres complètes sont produites, sauf si
+    la période entière est plus courte qu'une fenêtre.
+    """
+    if dates is None:
+        if n_scrutins <= window:
+            return [(0, n_scrutins)] if n_scrutins else []
+        return [(stop - window, stop) for stop in range(window, n_scrutins + 1, step)]
+
+    dates = pd.DatetimeIndex(dates)
+    starts = dates - pd.DateOffset(months=window)
+    first_full = np.searchsorted(dates, dates[0] + pd.DateOffset(months=window))
+    if first_full >= n_scrutins:
+        return [(0, n_scrutins)] if n_scrutins else []
+    bounds = []
+    for stop in range(first_full + 1, n_scrutins + 1, step):
+        start = int(np.searchsorted(dates, starts[stop - 1], side='right'))
+        bounds.append((start, stop))
+    return bounds
+
+
+def _gram_counts(values, present, positions, method, cols=slice(None)):
+    """
+    Comptages sur les scrutins `cols` dont se déduit la similarité `method`
+    (produit de Gram des votes pour 'cosine' ; sommes sur les scrutins communs
+    pour 'correlation' ; accords et présences communes sinon). Ils sont
+    additifs : les comptages de deux ensembles disjoints de scrutins s'ajoutent
+    pour donner ceux de leur réunion. `positions` liste les positions de vote.
+    """
+    p = present[:, cols]
+    x = np.where(p, values[:, cols], 0).astype(np.float64)
+    if method == 'cosine':
+        return (x @ x.T,)
+    presence = p.astype(np.float64)
+    if method == 'correlation':
+        return (x @ x.T, x @ presence.T, (x * x) @ presence.T, presence @ presence.T)
+    matches = np.zeros((len(x), len(x)))
+    for v in positions:
+        one_hot = ((x == v) & p).astype(np.float64)
+        matches += one_hot @ one_hot.T
+    return (matches, presence @ presence.T)
+
+
+def _similarity_from_counts(counts, method):
+    """Matrice de similarité à partir des comptages de `_gram_counts`."""
+    if method == 'cosine':
+        gram = counts[0]
+        norms = np.sqrt(np.diag(gram))
+        norms[norms == 0] = 1.0
+        return gram / norms[:, None] / norms[None, :]
+    if method == 'correlation':
+        sum_xy, sum_x, sum_xx, commun = counts
+        return _correlation_from_sums(sum_xy, sum_x, sum_x.T, sum_xx, sum_xx.T, commun, MIN_COMMUN)
+    matches, commun = counts
+    n_votes = np.diag(commun)
+    return _agreement_from_counts(matches, commun, n_votes, n_votes, method, MIN_COMMUN)
+
+
+def iter_window_similarity(pivot_df, window, step=1, method='cosine', dates=None):
+    """
+    Similarités sur des fenêtres glissantes de scrutins : `window` scrutins
+    consécutifs, ou `window` mois si `dates` (scrutin_id -> date) est fourni.
+    Produit (scrutins de la fenêtre, DataFrame de similarité député x député).
+
+    Les comptages (voir `_gram_counts`) sont mis à jour à chaque pas : on
+    ajoute les scrutins qui entrent dans la fenêtre et on retranche ceux qui en
+    sortent, sans tout recalculer. Les comptages étant entiers, les mises à
+    jour sont exactes. Tous les députés restent dans chaque matrice
+    (similarité nulle, ou NaN en corrélation, sans vote dans la fenêtre).
+    """
+    if method not in ('cosine', 'correlation', 'jaccard', 'agreement_weighted'):
+        raise ValueError(f"Méthode de similarité inconnue : {method}")
+
+    values, present = _values_and_presence(pivot_df)
+    columns = pd.Index(pivot_df.columns)
+    order = np.arange(len(columns))
+    window_dates = None
+    if dates is not None:
+        column_dates = pd.to_datetime(pd.Series(dates)).reindex(columns)
+        order = np.flatnonzero(column_dates.notna().to_numpy())
+        order = order[np.argsort(column_dates.to_numpy()[order], kind='stable')]
+        window_dates = column_dates.to_numpy()[order]
+    values, present, columns = values[:, order], present[:, order], columns[order]
+
+    positions = np.unique(values[present])
+    index = pivot_df.index
+
+    state, lo, hi = None, 0, 0
+    for start, stop in _window_bounds(len(columns), window, step, window_dates):
+        if state is None:
+            state = list(_gram_counts(values, present, positions, method, slice(start, stop)))
+        else:
+            if stop > hi:
+                for total, part in zip(state, _gram_counts(values, present, positions, method, slice(hi, stop))):
+                    total += part
+            if start > lo:
+                for total, part in zip(state, _gram_counts(values, present, positions, method, slice(lo, start))):
+                    total -= part
+        lo, hi = start, stop
+        yield columns[start:stop], pd.DataFrame(_similarity_from_counts(state, method), index=index, columns=index)
+
+
+class ThemeGrams:
+    """
+    Comptages de similarité (voir `_gram_counts`) par thème, calculés en un
+    seul passage sur les colonnes de la matrice de votes.
+
+    Les scrutins sont répartis en blocs disjoints selon l'ensemble des thèmes
+    auxquels ils appartiennent (un seul thème d'ordinaire, plusieurs avec
+    `all_matches`, aucun pour les scrutins « Autres »). Les comptages étant
+    additifs, ceux d'un thème, d'une réunion de thèmes ou de la législature
+    entière (tous les blocs) sont des sommes de blocs, composées à la demande
+    sans relire les votes.
+    """
+
+    def __init__(self, index, themes, blocks, counts, method='cosine'):
+        self.index = pd.Index(index)
+        self.themes = list(themes)
+        self.blocks = [frozenset(b) for b in blocks]
+        self.counts = counts
+        self.method = method
+
+    @classmethod
+    def compute(cls, pivot_df, themes, method='cosine'):
+        """
+        `pivot_df` : pivot ou `VoteMatrix` de la législature ; `themes` : {thème:
+        [scrutin_id]} (par exemple `get_scrutins_by_theme`). Les scrutins absents
+        de tous les thèmes forment le bloc `AUTRES`.
+        """
+        values, present = _values_and_presence(pivot_df)
+        columns = pd.Index(pivot_df.columns)
+        names = [name for name in themes if name != AUTRES] + [AUTRES]
+
+        membership = np.zeros((len(names), len(columns)), dtype=bool)
+        for i, name in enumerate(names[:-1]):
+            found = columns.get_indexer(pd.Index(themes[name]).unique())
+            membership[i, found[found >= 0]] = True
+        membership[-1] = ~membership[:-1].any(axis=0)
+
+        # Un bloc par combinaison de thèmes rencontrée ; chaque colonne n'est lue qu'une fois
+        signatures, block_of = np.unique(membership.T, axis=0, return_inverse=True)
+        positions = np.unique(values[present])
+        counts = [_gram_counts(values, present, positions, method, np.flatnonzero(block_of == b))
+                  for b in range(len(signatures))]
+        blocks = [{names[i] for i in np.flatnonzero(sig)} for sig in signatures]
+        if not counts:
+            counts, blocks = [_gram_counts(values, present, positions, method, [])], [set()]
+        return cls(pivot_df.index, names, blocks, counts, method)
+
+    def _total(self, themes=None):
+        if themes is not None:
+            unknown = set(themes) - set(self.themes)
+            if unknown:
+                raise KeyError(f"Thèmes inconnus : {sorted(unknown)}")
+        selected = [c for b, c in zip(self.blocks, self.counts) if themes is None or b & set(themes)]
+        if not selected:
+            return tuple(np.zeros_like(c) for c in self.counts[0])
+        return tuple(sum(parts) for parts in zip(*selected))
+
+    def similarity(self, themes=None, deputes=None):
+        """
+        Similarité sur la réunion des scrutins de `themes` (tous si None, soit
+        la législature entière), restreinte aux députés `deputes` si fournis.
+        """
+        counts = self._total(themes)
+        index = self.index
+        if deputes is not None:
+            index = pd.Index(deputes)
+            rows = self.index.get_indexer(index)
+            if (rows < 0).any():
+                raise KeyError(f"Députés inconnus : {list(index[rows < 0][:5])}")
+            counts = tuple(c[np.ix_(rows, rows)] for c in counts)
+        return pd.DataFrame(_similarity_from_counts(counts, self.method), index=index, columns=index)
+
+    def to_arrays(self):
+        """Tableaux sérialisables (comptages entiers en int32) pour `np.savez`."""
+        arrays = {'index': np.asarray(self.index, dtype=str), 'themes': np.asarray(self.themes, dtype=str),
+                  'blocks': np.array([[t in b for t in self.themes] for b in self.blocks], dtype=bool),
+                  'method': np.asarray(self.method)}
+        for b, counts in enumerate(self.counts):
+            for i, c in enumerate(counts):
+                arrays[f'counts_{b}_{i}'] = np.rint(c).astype(np.int32)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        themes = [str(t) for t in arrays['themes']]
+        blocks = [{t for t, member in zip(themes, row) if member} for row in arrays['blocks']]
+        n_counts = sum(1 for key in arrays if key.startswith('counts_0_'))
+        counts = [tuple(arrays[f'counts_{b}_{i}'].astype(np.float64) for i in range(n_counts))
+                  for b in range(len(blocks))]
+        return cls(arrays['index'], themes, blocks, counts, str(arrays['method']))
+
+
 if __name__ == "__main__":
     # Test rapide de la fonction de similarité
     data = {
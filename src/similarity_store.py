@@ -0,0 +1,254 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from src.similarity import iter_similarity_blocks
+
+# Statistiques par colonne calculées au fil de l'écriture (comme `DataFrame.describe`, sans les quantiles)
+STATS = ['count', 'mean', 'std', 'min', 'max']
+
+
+class _ColumnStats:
+    """Effectif, moyenne, écart-type, min et max de chaque colonne, accumulés bloc par bloc (NaN ignorés)."""
+
+    def __init__(self, n):
+        self.count = np.zeros(n)
+        self.sum = np.zeros(n)
+        self.sumsq = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+
+    def update(self, block):
+        valid = ~np.isnan(block)
+        filled = np.where(valid, block, 0.0)
+        self.count += valid.sum(axis=0)
+        self.sum += filled.sum(axis=0)
+        self.sumsq += (filled * filled).sum(axis=0)
+        self.min = np.fmin(self.min, np.where(valid, block, np.inf).min(axis=0))
+        self.max = np.fmax(self.max, np.where(valid, block, -np.inf).max(axis=0))
+
+    def finish(self):
+        seen = self.count > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(seen, self.sum / self.count, np.nan)
+            var = (self.sumsq - self.count * mean ** 2) / (self.count - 1)
+        return {
+            'count': self.count,
+            'mean': mean,
+            'std': np.where(self.count > 1, np.sqrt(np.maximum(var, 0)), np.nan),
+            'min': np.where(seen, self.min, np.nan),
+            'max': np.where(seen, self.max, np.nan),
+        }
+
+
+def _top_k(block, start, k):
+    """
+    Positions (lignes, colonnes) des `k` plus grandes valeurs de chaque ligne
+    hors diagonale, plus la diagonale. À égalité, les premières colonnes sont
+    gardées, comme dans la sélection des k plus proches voisins.
+    """
+    n_rows, n = block.shape
+    local = np.arange(n_rows)
+    ranked = np.where(np.isnan(block), -np.inf, block)
+    ranked[local, local + start] = -np.inf
+    k = min(k, n - 1)
+    selected = np.zeros_like(ranked, dtype=bool)
+    if k > 0:
+        kth = np.partition(ranked, -k, axis=1)[:, -k][:, None]
+        above = ranked > kth
+        ties = (ranked == kth) & (np.cumsum(ranked == kth, axis=1) <= k - above.sum(axis=1, keepdims=True))
+        selected = (above | ties) & np.isfinite(ranked)
+    selected[local, local + start] = True
+    return np.nonzero(selected)
+
+
+class SimilarityMatrix:
+    """
+    Matrice de similarité député x député stockée hors mémoire.
+
+    Les blocs de lignes calculés par `iter_similarity_blocks` sont écrits
+    directement dans un fichier `.npy` projeté en mémoire (float32 par défaut,
+    ou float16), si bien que la matrice complète n'est jamais en float64 en
+    mémoire. Avec `top_k`, seules les `top_k` plus fortes similarités de chaque
+    ligne (et la diagonale) sont conservées, en matrice creuse ; les autres
+    valent NaN à la lecture.
+
+    Les statistiques par colonne (`describe`) sont accumulées pendant l'écriture
+    sur les valeurs exactes. Avec `neighbors=k`, les k plus proches voisins de
+    chaque ligne (`knn`) sont eux aussi choisis sur les valeurs exactes, avant
+    la conversion : en float32, des similarités voisines peuvent devenir
+    égales et changer le voisin retenu. Les lignes sont lues à la demande (`rows`,
+    `iter_blocks`, `reindex`) ; une matrice écrite sur disque se rouvre sans
+    recalcul avec `SimilarityMatrix.open`.
+
+    Fichiers d'une matrice de chemin `path` : `path.npy` (mode dense) et
+    `path.meta.npz` (députés, statistiques, entrées conservées en mode top-k
+    et voisins),
+    écrit en dernier et qui marque donc une matrice complète.
+    """
+
+    def __init__(self, index, values=None, kept=None, stats=None, method=None, knn=None, knn_k=None):
+        self.index = pd.Index(index)
+        self.values = values
+        self.kept = kept
+        self.stats = stats
+        self.method = method
+        self.knn = knn
+        self.knn_k = knn_k
+
+    @property
+    def columns(self):
+        return self.index
+
+    @property
+    def shape(self):
+        return (len(self.index), len(self.index))
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def dtype(self):
+        return (self.values if self.values is not None else self.kept).dtype
+
+    @classmethod
+    def compute(cls, pivot_df, method='cosine', path=None, dtype='float32', top_k=None, neighbors=None,
+                block_size=256):
+        """
+        Calcule la similarité de `pivot_df` (pivot ou `VoteMatrix`) par blocs et
+        l'écrit dans `path` (en mémoire si `path` vaut None).
+        """
+        blocks = iter_similarity_blocks(pivot_df, method=method, block_size=block_size)
+        return cls.write(blocks, pivot_df.index, path, dtype=dtype, top_k=top_k, method=method,
+                         neighbors=neighbors)
+
+    @classmethod
+    def write(cls, blocks, index, path=None, dtype='float32', top_k=None, method=None, neighbors=None):
+        """
+        Écrit les blocs (start, stop, bloc) d'une matrice de similarité indexée
+        par `index`, et sélectionne les `neighbors` plus proches voisins de
+        chaque ligne sur les valeurs exactes.
+        """
+        index = pd.Index(index)
+        n = len(index)
+        dtype = np.dtype(dtype)
+        stats = _ColumnStats(n)
+
+        values, entries, knn_entries = None, [], []
+        if top_k is None:
+            if path:
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                tmp_path = f"{path}.tmp{os.getpid()}.npy"
+                values = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dtype, shape=(n, n))
+            else:
+                values = np.empty((n, n), dtype=dtype)
+
+        for start, stop, block in blocks:
+            stats.update(block)
+            if neighbors is not None:
+                # Mêmes voisins que `graph.knn_from_similarity` : hors diagonale, similarité positive
+                rows, cols = _top_k(block, start, neighbors)
+                weights = block[rows, cols]
+                keep = (rows + start != cols) & (weights > 0)
+                knn_entries.append((rows[keep] + start, cols[keep], weights[keep].astype(np.float64)))
+            if values is not None:
+                values[start:stop] = block
+            else:
+                rows, cols = _top_k(block, start, top_k)
+                entries.append((rows + start, cols, block[rows, cols].astype(dtype)))
+
+        kept = None
+        if values is None:
+            rows, cols, data = (np.concatenate(a) for a in zip(*entries)) if entries else \
+                (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=dtype))
+            kept = sparse.csr_array((data, (rows, cols)), shape=(n, n))
+
+        knn = None
+        if neighbors is not None:
+            rows, cols, data = (np.concatenate(a) for a in zip(*knn_entries)) if knn_entries else \
+                (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0))
+            knn = sparse.csr_array((data, (rows, cols)), shape=(n, n))
+
+        if not path:
+            return cls(index, values, kept, stats.finish(), method, knn, neighbors)
+        if values is not None:
+            values.flush()
+            del values
+            os.replace(tmp_path, f"{path}.npy")
+        cls(index, None, kept, stats.finish(), method, knn, neighbors)._write_meta(path)
+        return cls.open(path)
+
+    def _write_meta(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        arrays = {f"stat_{name}": self.stats[name] for name in STATS}
+        if self.kept is not None:
+            arrays.update(topk_data=self.kept.data, topk_indices=self.kept.indices,
+                          topk_indptr=self.kept.indptr)
+        if self.knn is not None:
+            arrays.update(knn_data=self.knn.data, knn_indices=self.knn.indices, knn_indptr=self.knn.indptr,
+                          knn_k=self.knn_k)
+        tmp_path = f"{path}.tmp{os.getpid()}.meta.npz"
+        np.savez(tmp_path, index=np.asarray(self.index, dtype=str), index_name=str(self.index.name or ''),
+                 method=str(self.method or ''), **arrays)
+        os.replace(tmp_path, f"{path}.meta.npz")
+
+    @classmethod
+    def open(cls, path):
+        """Rouvre une matrice écrite par `write` ; le fichier dense est projeté en mémoire, pas lu."""
+        with np.load(f"{path}.meta.npz") as meta:
+            index = pd.Index(meta['index'], name=str(meta['index_name']) or None)
+            stats = {name: meta[f"stat_{name}"] for name in STATS}
+            method = str(meta['method']) or None
+            kept = None
+            if 'topk_data' in meta.files:
+                kept = sparse.csr_array((meta['topk_data'], meta['topk_indices'], meta['topk_indptr']),
+                                         shape=(len(index), len(index)))
+            knn, knn_k = None, None
+            if 'knn_data' in meta.files:
+                knn = sparse.csr_array((meta['knn_data'], meta['knn_indices'], meta['knn_indptr']),
+                                       shape=(len(index), len(index)))
+                knn_k = int(meta['knn_k'])
+        values = np.load(f"{path}.npy", mmap_mode='r') if kept is None else None
+        return cls(index, values, kept, stats, method, knn, knn_k)
+
+    def _take(self, positions):
+        """Lignes `positions` en float64 (NaN pour les entrées non conservées en mode top-k)."""
+        if self.values is not None:
+            return np.asarray(self.values[positions], dtype=np.float64)
+        sub = self.kept[positions].tocoo()
+        block = np.full((sub.shape[0], len(self)), np.nan)
+        block[sub.row, sub.col] = sub.data
+        return block
+
+    def rows(self, start, stop):
+        if self.values is not None:
+            return np.asarray(self.values[start:stop], dtype=np.float64)
+        return self._take(np.arange(start, min(stop, len(self))))
+
+    def iter_blocks(self, block_size=256):
+        """Produit (start, stop, bloc) comme `iter_similarity_blocks`, lu depuis le stockage."""
+        for start in range(0, len(self), block_size):
+            stop = min(start + block_size, len(self))
+            yield start, stop, self.rows(start, stop)
+
+    def row(self, label):
+        return pd.Series(self._take(np.array([self.index.get_loc(label)]))[0], index=self.index, name=label)
+
+    def reindex(self, index=None, columns=None):
+        """Sous-matrice dense (DataFrame) des députés demandés ; NaN pour les inconnus."""
+        index = self.index if index is None else pd.Index(index)
+        columns = self.index if columns is None else pd.Index(columns)
+        ri, ci = self.index.get_indexer(index), self.index.get_indexer(columns)
+        block = np.full((len(index), len(columns)), np.nan)
+        known_r, known_c = ri >= 0, ci >= 0
+        if known_r.any():
+            block[np.ix_(known_r, known_c)] = self._take(ri[known_r])[:, ci[known_c]]
+        return pd.DataFrame(block, index=index, columns=columns)
+
+    def to_frame(self):
+        return self.reindex()
+
+    def describe(self):
+        """Statistiques par colonne accumulées à l'écriture (effectif, moyenne, écart-type, min, max)."""
+        return pd.DataFrame([self.stats[name] for name in STATS], index=STATS, columns=self.index)
@@ -1,34 +1,42 @@
-import matplotlib.pyplot as plt
-import seaborn as sns # type: ignore
+import numpy as np
+import pandas as pd
+from src.render import render_voter_histogram
+from src.votes import VoteMatrix
 
-def plot_voter_distribution(df, theme_name, output_path):
+def voters_per_scrutin(df, participation=None):
+    """
+    Nombre de votants par scrutin, pour le tableau long des votes ou une
+    `VoteMatrix` (lu dans l'index `participation` si fourni).
+    """
+    if isinstance(df, VoteMatrix):
+        return participation.voter_counts(df.columns) if participation is not None else df.voter_counts()
+    return df.groupby('scrutin_id')['depute'].nunique()
+
+
+def plot_voter_distribution(df, theme_name, output_path, participation=None):
     """
     Génère un histogramme de la participation (nombre de votants par scrutin).
+    Accepte le tableau long des votes ou une `VoteMatrix` (voir `voters_per_scrutin`).
     """
-    voters_per_scrutin = df.groupby('scrutin_id')['depute'].nunique()
-    
-    plt.figure(figsize=(10, 6))
-    sns.histplot(voters_per_scrutin, bins=30, kde=True, color='skyblue')
-    
-    plt.title(f"Distribution de la participation : {theme_name}")
-    plt.xlabel("Nombre de votants")
-    plt.ylabel("Nombre de scrutins")
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    
-    plt.savefig(output_path)
-    plt.close()
+    voters = voters_per_scrutin(df, participation)
+    render_voter_histogram(voters, theme_name, output_path)
     print(f"Graphique de distribution sauvegardé : {output_path}")
 
     print(f"\nStats de participation pour {theme_name} :")
-    print(voters_per_scrutin.describe())
+    print(voters.describe())
 
-def analyze_attendance(df, theme_name, top_n=10):
+def analyze_attendance(df, theme_name, top_n=10, participation=None):
     """
     Calcule et affiche les stats de présence/absence par député et par groupe.
+    Accepte le tableau long des votes ou une `VoteMatrix` ; pour une matrice,
+    les présences sont lues dans `participation` (`ParticipationIndex`) si fourni.
     """
-    total_scrutins = df['scrutin_id'].nunique()
-    
-    att = df.groupby(['depute', 'groupe']).size().reset_index(name='presences')
+    if isinstance(df, VoteMatrix):
+        total_scrutins = df.shape[1]
+        att = participation.pair_presences(df.columns) if participation is not None else _presences_by_pair(df)
+    else:
+        total_scrutins = df['scrutin_id'].nunique()
+        att = df.groupby(['depute', 'groupe']).size().reset_index(name='presences')
     att['absences'] = total_scrutins - att['presences']
     att['taux_presence_pct'] = (att['presences'] / total_scrutins) * 100
 
@@ -49,4 +57,21 @@ def analyze_attendance(df, theme_name, top_n=10):
     print(f"\nSTATS PAR GROUPE (Moyenne du taux de présence) :")
     print(group_stats.sort_values(by='taux_presence_pct', ascending=False))
     
-    return att, group_stats
\ No newline at end of file
+    return att, group_stats
+
+
+def _presences_by_pair(votes):
+    """
+    Nombre de scrutins où figure chaque couple (depute, groupe), par un seul
+    `bincount` sur les cellules renseignées de la matrice.
+    """
+    n_groups = len(votes.group_labels)
+    rows, cols = np.nonzero(votes.listed)
+    pair = rows.astype(np.int64) * n_groups + votes.groups[rows, cols]
+    counts = np.bincount(pair, minlength=len(votes) * n_groups)
+    pairs = np.flatnonzero(counts)
+    return pd.DataFrame({
+        'depute': votes.deputes[pairs // n_groups],
+        'groupe': votes.group_labels[pairs % n_groups],
+        'presences': counts[pairs],
+    })
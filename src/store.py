@@ -0,0 +1,161 @@
+import os
+import numpy as np
+import pandas as pd
+from src import instrument
+from src.config import LEGIS_MAP
+from src.fetcher import sync
+from src.participation import ParticipationIndex
+from src.votes import VoteMatrix
+
+
+def _save_npz(path, **arrays):
+    # Écriture atomique : les autres processus lisent l'ancienne copie ou la nouvelle, jamais un fichier partiel
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+class VoteMatrixStore:
+    """
+    Matrices de votes (député x scrutin) construites une seule fois par législature.
+
+    Le CSV est lu et converti en `VoteMatrix` au premier accès ; seule cette
+    matrice compacte est conservée en mémoire. Une copie `.npz` optionnelle
+    évite de relire le CSV lors des exécutions suivantes tant qu'il n'a pas
+    été modifié.
+
+    Chaque législature chargée a aussi son `ParticipationIndex` (`participation`),
+    pour les comptages de votants et de présences. Il est gardé sur disque à
+    côté de la matrice ; après une synchronisation, seuls les scrutins ajoutés
+    ou remplacés y sont intégrés (`ParticipationIndex.update`), et il n'est
+    reconstruit entièrement qu'en l'absence de copie utilisable. La mise à jour
+    a lieu dans le processus qui a synchronisé (`scheduler.prepare_legislature`) ;
+    les autres relisent la copie à jour.
+
+    Avec un `identity` (`DeputyIndex`), chaque député chargé reçoit son
+    identifiant stable inter-législatures (`VoteMatrix.depute_ids`).
+
+    Avec `sync=True`, le CSV est d'abord complété par les nouveaux scrutins
+    (voir `fetcher.sync`), après re-vérification des `recheck_last` derniers ;
+    un CSV absent est toujours téléchargé de cette façon, ce qui rend le
+    premier téléchargement reprenable. `load` accepte aussi ces deux options
+    pour une législature donnée.
+    """
+
+    def __init__(self, output_root="Output", persist=True, sync=False, identity=None, recheck_last=0):
+        self.output_root = output_root
+        self.identity = identity
+        self.persist = persist
+        self.sync = sync
+        self.recheck_last = recheck_last
+        self._cache = {}
+        self._participation = {}
+        self._synced = {}
+
+    def output_dir(self, legislature):
+        years = LEGIS_MAP.get(legislature, f"legis_{legislature}")
+        return os.path.join(self.output_root, years)
+
+    def csv_path(self, legislature):
+        return os.path.join(self.output_dir(legislature), f"dataset_scrutins_{legislature}.csv")
+
+    def matrix_path(self, legislature):
+        return os.path.join(self.output_dir(legislature), f"vote_matrix_{legislature}.npz")
+
+    def participation_path(self, legislature):
+        return os.path.join(self.output_dir(legislature), f"participation_{legislature}.npz")
+
+    def load(self, legislature, sync=None, recheck_last=None):
+        """
+        Retourne la `VoteMatrix` complète de la législature. `sync` et
+        `recheck_last` remplacent, au premier chargement, les options du store.
+        """
+        if legislature not in self._cache:
+            sync = self.sync if sync is None else sync
+            recheck_last = self.recheck_last if recheck_last is None else recheck_last
+            with instrument.span('load', legislature=legislature):
+                votes = self._load_matrix(legislature, sync, recheck_last)
+            if self.identity is not None:
+                votes.depute_ids = self.identity.register(votes.deputes, legislature=legislature)
+            self._cache[legislature] = votes
+        return self._cache[legislature]
+
+    def participation(self, legislature):
+        """Retourne le `ParticipationIndex` de la législature."""
+        if legislature not in self._participation:
+            self._participation[legislature] = self._load_participation(legislature, self.load(legislature))
+        return self._participation[legislature]
+
+    def _load_participation(self, legislature, votes):
+        path = self.participation_path(legislature)
+        source_mtime = os.path.getmtime(self.csv_path(legislature))
+        saved_mtime = None
+        if self.persist and os.path.exists(path):
+            with np.load(path) as data:
+                arrays = {k: data[k] for k in data.files}
+            saved_mtime = float(arrays.pop('source_mtime'))
+
+        index = None
+        if saved_mtime == source_mtime:
+            return ParticipationIndex.from_arrays(arrays)
+        if saved_mtime is not None and legislature in self._synced:
+            # Copie antérieure à la synchronisation : on n'y intègre que les scrutins qu'elle a modifiés
+            synced_from, updated = self._synced[legislature]
+            if saved_mtime == synced_from:
+                with instrument.span('participation', legislature=legislature, updated=len(updated)):
+                    index = ParticipationIndex.from_arrays(arrays)
+                    if updated:
+                        index.update(votes.take(updated))
+                if not index.scrutins.equals(votes.scrutins):
+                    index = None
+        if index is None:
+            with instrument.span('participation', legislature=legislature):
+                index = ParticipationIndex.from_matrix(votes)
+
+        if self.persist:
+            _save_npz(path, source_mtime=source_mtime, **index.to_arrays())
+        return index
+
+    def select(self, legislature, scrutin_ids=None):
+        """
+        Extrait les colonnes `scrutin_ids` de la matrice en cache, sans relire
+        les votes. Les députés absents de tous ces scrutins sont retirés.
+        """
+        votes = self.load(legislature)
+        if scrutin_ids is None:
+            return votes
+        return votes.take(scrutin_ids)
+
+    def _load_matrix(self, legislature, sync_csv=False, recheck_last=0):
+        csv_path = self.csv_path(legislature)
+        if sync_csv or not os.path.exists(csv_path):
+            synced_from = os.path.getmtime(csv_path) if os.path.exists(csv_path) else None
+            with instrument.span('fetch', legislature=legislature):
+                summary = sync(legislature, csv_path, workers=10, recheck_last=recheck_last)
+            self._synced[legislature] = (synced_from, summary['updated'])
+
+        npz_path = self.matrix_path(legislature)
+        source_mtime = os.path.getmtime(csv_path)
+
+        if self.persist and os.path.exists(npz_path):
+            with np.load(npz_path) as data:
+                if 'codes' in data.files and float(data['source_mtime']) == source_mtime:
+                    return VoteMatrix(data['codes'], data['groups'], data['deputes'],
+                                      data['scrutins'], data['group_labels'])
+
+        df = pd.read_csv(csv_path)
+        with instrument.span('pivot', legislature=legislature, rows=len(df)):
+            votes = VoteMatrix.from_long(df)
+
+        if self.persist:
+            _save_npz(
+                npz_path,
+                codes=votes.codes,
+                groups=votes.groups,
+                deputes=np.asarray(votes.deputes, dtype=str),
+                scrutins=np.asarray(votes.scrutins),
+                group_labels=np.asarray(votes.group_labels, dtype=str),
+                source_mtime=source_mtime,
+            )
+        return votes
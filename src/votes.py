@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+# Codes int8 des positions ; ABSENT : le député n'apparaît pas dans le scrutin
+POUR, CONTRE, ABSTENTION, NON_VOTANT, ABSENT = 1, -1, 0, 2, -128
+POSITION_CODES = {'pour': POUR, 'contre': CONTRE, 'abstention': ABSTENTION, 'nonVotant': NON_VOTANT}
+
+
+class VoteMatrix:
+    """
+    Matrice député x scrutin compacte, remplaçant le `pivot_table` flottant.
+
+    - `codes` (int8) : position de chaque député à chaque scrutin (POUR, CONTRE,
+      ABSTENTION, NON_VOTANT ou ABSENT) ;
+    - `groups` (int8, int16 au-delà de 127 groupes) : code du groupe du député lors du scrutin (-1 si absent) ;
+    - `deputes`, `group_labels` : libellés des codes de lignes et de groupes ;
+    - `scrutins` : numéros des scrutins (colonnes) ;
+    - `depute_ids` (int32, optionnel) : identifiant stable de chaque ligne dans
+      l'index des députés (`identity.DeputyIndex`), commun aux législatures.
+
+    Soit 2 octets par cellule, contre 8 pour le pivot float64, sans garder le
+    tableau long des votes en mémoire.
+    """
+
+    def __init__(self, codes, groups, deputes, scrutins, group_labels, depute_ids=None):
+        self.codes = codes
+        self.groups = groups
+        self.deputes = pd.Index(deputes, name='depute')
+        self.scrutins = pd.Index(scrutins, name='scrutin_id')
+        self.group_labels = pd.Index(group_labels)
+        self.depute_ids = depute_ids
+
+    @classmethod
+    def from_long(cls, df):
+        """
+        Construit la matrice depuis le tableau long (depute, groupe, position,
+        scrutin_id). Si un député figure deux fois dans un même scrutin, la
+        dernière position exprimée l'emporte.
+        """
+        deputes = pd.Categorical(df['depute'])
+        scrutins = pd.Categorical(df['scrutin_id'])
+        groupes = pd.Categorical(df['groupe'])
+        positions = df['position'].map(POSITION_CODES).to_numpy()
+        known = ~pd.isna(positions)
+
+        shape = (len(deputes.categories), len(scrutins.categories))
+        codes = np.full(shape, ABSENT, dtype=np.int8)
+        groups = np.full(shape, -1, dtype=np.int8 if len(groupes.categories) < 128 else np.int16)
+
+        rows, cols = deputes.codes[known], scrutins.codes[known]
+        position_codes = positions[known].astype(np.int8)
+        # Les non-votants d'abord, pour qu'ils n'écrasent pas un vote exprimé
+        non_votant = position_codes == NON_VOTANT
+        codes[rows[non_votant], cols[non_votant]] = NON_VOTANT
+        codes[rows[~non_votant], cols[~non_votant]] = position_codes[~non_votant]
+        groups[rows, cols] = groupes.codes[known]
+
+        return cls(codes, groups, deputes.categories, scrutins.categories, groupes.categories)
+
+    # --- Accès de type DataFrame ---
+
+    @property
+    def index(self):
+        return self.deputes
+
+    @property
+    def columns(self):
+        return self.scrutins
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.groups.nbytes
+
+    @property
+    def voted(self):
+        """Masque des votes exprimés (pour, contre ou abstention)."""
+        return (self.codes != ABSENT) & (self.codes != NON_VOTANT)
+
+    @property
+    def listed(self):
+        """Masque des députés figurant dans le scrutin, non-votants compris."""
+        return self.codes != ABSENT
+
+    def filled(self, dtype=np.float64, start=0, stop=None):
+        """Valeurs numériques (MAP_VOTE), 0 hors votes exprimés, pour les lignes [start, stop)."""
+        codes = self.codes[start:stop]
+        voted = (codes != ABSENT) & (codes != NON_VOTANT)
+        return np.where(voted, codes, 0).astype(dtype)
+
+    def to_frame(self):
+        """Équivalent flottant du `pivot_table` (NaN hors votes exprimés)."""
+        values = np.where(self.voted, self.codes, np.nan)
+        return pd.DataFrame(values, index=self.deputes, columns=self.scrutins)
+
+    # --- Sélections ---
+
+    def _subset(self, rows, cols):
+        depute_ids = self.depute_ids[rows] if self.depute_ids is not None else None
+        return VoteMatrix(self.codes[np.ix_(rows, cols)], self.groups[np.ix_(rows, cols)],
+                          self.deputes[rows], self.scrutins[cols], self.group_labels, depute_ids)
+
+    def take(self, scrutin_ids):
+        """
+        Restreint la matrice aux scrutins `scrutin_ids` ; les députés absents de
+        tous ces scrutins sont retirés, comme après un filtrage du tableau long.
+        """
+        positions = self.scrutins.get_indexer(pd.Index(scrutin_ids).unique())
+        cols = np.sort(positions[positions >= 0])
+        if len(cols) == self.shape[1]:
+            return self
+        rows = np.flatnonzero((self.codes[:, cols] != ABSENT).any(axis=1))
+        return self._subset(rows, cols)
+
+    def drop_unvoted(self):
+        """Retire les députés et scrutins sans aucun vote exprimé (comme `pivot_table`)."""
+        voted = self.voted
+        rows = np.flatnonzero(voted.any(axis=1))
+        cols = np.flatnonzero(voted.any(axis=0))
+        if len(rows) == self.shape[0] and len(cols) == self.shape[1]:
+            return self
+        return self._subset(rows, cols)
+
+    # --- Comptages et métadonnées ---
+
+    def voter_counts(self):
+        """Nombre de députés figurant dans chaque scrutin (non-votants compris)."""
+        return pd.Series(self.listed.sum(axis=0), index=self.scrutins)
+
+    def describe(self):
+        """
+        Statistiques des votes exprimés de chaque scrutin (effectif, moyenne,
+        écart-type, min, max), comme `to_frame().describe()` sans les quantiles,
+        calculées sur les codes sans construire le pivot flottant.
+        """
+        pour = (self.codes == POUR).sum(axis=0)
+        contre = (self.codes == CONTRE).sum(axis=0)
+        count = pour + contre + (self.codes == ABSTENTION).sum(axis=0)
+        seen = count > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(seen, (pour - contre) / count, np.nan)
+            var = ((pour + contre) - count * mean ** 2) / (count - 1)
+        stats = {
+            'count': count.astype(np.float64),
+            'mean': mean,
+            'std': np.where(count > 1, np.sqrt(np.maximum(var, 0)), np.nan),
+            'min': np.where(seen, np.where(contre > 0, CONTRE, np.where(count > pour, ABSTENTION, POUR)), np.nan),
+            'max': np.where(seen, np.where(pour > 0, POUR, np.where(count > contre, ABSTENTION, CONTRE)), np.nan),
+        }
+        return pd.DataFrame(list(stats.values()), index=list(stats), columns=self.scrutins)
+
+    def meta(self):
+        """
+        Couples (depute, groupe) distincts, rangés par dernière apparition :
+        un `groupby('depute').last()` donne le groupe le plus récent.
+        """
+        rows, cols = np.nonzero(self.groups >= 0)
+        pair = rows.astype(np.int64) * len(self.group_labels) + self.groups[rows, cols]
+        last_col = pd.Series(cols).groupby(pair).max()
+        pairs = last_col.sort_values(kind='stable').index.to_numpy()
+        return pd.DataFrame({
+            'depute': self.deputes[pairs // len(self.group_labels)],
+            'groupe': self.group_labels[pairs % len(self.group_labels)],
+        })
@@ -0,0 +1,222 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from src.fetcher import ScrutinFetcher, sync
+
+SCRUTIN_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<votes>
+  <vote><parlementaire_slug>alice-martin</parlementaire_slug><parlementaire_groupe_acronyme>GDR</parlementaire_groupe_acronyme><position>pour</position></vote>
+  <vote><parlementaire_slug>bruno-petit</parlementaire_slug><parlementaire_groupe_acronyme>LR</parlementaire_groupe_acronyme><position>contre</position></vote>
+</votes>
+"""
+
+
+class FakeAssembly:
+    """
+    Serveur HTTP local imitant nosdeputes.fr : `/14/scrutin/<id>/xml` répond
+    200 pour les IDs de `ids`, 404 sinon ; les IDs de `flaky` répondent 503
+    autant de fois qu'indiqué avant de répondre normalement.
+    """
+
+    def __init__(self, ids, flaky=None):
+        self.ids = set(ids)
+        self.flaky = dict(flaky or {})
+        self.requests = []
+        self._lock = threading.Lock()
+
+        assembly = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                match = re.fullmatch(r"/14/scrutin/(\d+)/xml", self.path)
+                scrutin_id = int(match.group(1)) if match else None
+                with assembly._lock:
+                    assembly.requests.append(scrutin_id)
+                    failures = assembly.flaky.get(scrutin_id, 0)
+                    if failures:
+                        assembly.flaky[scrutin_id] = failures - 1
+                if failures:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if scrutin_id not in assembly.ids:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = SCRUTIN_XML.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", f'"{scrutin_id}"')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/14/scrutin"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def assembly(request):
+    ids, flaky = request.param
+    with FakeAssembly(ids, flaky) as server:
+        yield server
+
+
+def make_fetcher(server, **kwargs):
+    return ScrutinFetcher(legislature=14, base_url=server.base_url, backoff=0, timeout=5, **kwargs)
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 301), None)], indirect=True)
+def test_find_last_id_contiguous(assembly):
+    fetcher = make_fetcher(assembly)
+    assert fetcher.find_last_id() == 300
+    # Recherche exponentielle puis dichotomique, puis fenêtre de fin : bien moins qu'un parcours complet
+    assert len(assembly.requests) < 200
+
+
+@pytest.mark.parametrize("assembly", [([i for i in range(1, 301) if not 60 <= i <= 70], None)], indirect=True)
+def test_find_last_id_skips_wide_gap(assembly):
+    assert make_fetcher(assembly).find_last_id() == 300
+
+
+@pytest.mark.parametrize("assembly", [(list(range(1, 51)) + list(range(140, 161)), None)], indirect=True)
+def test_find_last_id_gap_wider_than_end_gap(assembly):
+    # Un trou de plus de `end_gap` IDs marque la fin des données
+    assert make_fetcher(assembly).find_last_id(end_gap=50) == 50
+    assert make_fetcher(assembly).find_last_id(end_gap=100) == 160
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 21), None)], indirect=True)
+def test_find_last_id_without_new_scrutins(assembly):
+    assert make_fetcher(assembly).find_last_id(start=21) == 20
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 301), {300: 2})], indirect=True)
+def test_find_last_id_retries_failed_probe(assembly):
+    # Le dernier scrutin échoue d'abord : il ne doit pas passer pour absent
+    assert make_fetcher(assembly, max_retries=0).find_last_id() == 300
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 301), {300: 100})], indirect=True)
+def test_find_last_id_fails_when_probe_keeps_failing(assembly):
+    with pytest.raises(ConnectionError):
+        make_fetcher(assembly, max_retries=0).find_last_id()
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 4), None)], indirect=True)
+def test_fetch_scrutin_not_found(assembly):
+    data, meta = make_fetcher(assembly).fetch_scrutin(7)
+    assert data is None and meta is None
+    assert assembly.requests == [7]
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 4), {2: 2})], indirect=True)
+def test_fetch_scrutin_retries_transient_errors(assembly):
+    data, meta = make_fetcher(assembly, max_retries=3).fetch_scrutin(2)
+    assert list(data['depute']) == ['alice-martin', 'bruno-petit']
+    assert (data['scrutin_id'] == 2).all()
+    assert meta['etag'] == '"2"'
+    assert assembly.requests == [2, 2, 2]
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 4), {2: 5})], indirect=True)
+def test_fetch_scrutin_gives_up_after_max_retries(assembly):
+    data, meta = make_fetcher(assembly, max_retries=2).fetch_scrutin(2)
+    assert data is None and meta == {'failed': True}
+    assert assembly.requests == [2, 2, 2]
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 301), None)], indirect=True)
+def test_probed_scrutins_are_not_requested_again(assembly):
+    fetcher = make_fetcher(assembly)
+    fetcher.find_last_id()
+    probed = set(fetcher._probed)
+    before = len(assembly.requests)
+    for scrutin_id in probed:
+        assert fetcher.fetch_scrutin(scrutin_id)[0] is not None
+    assert len(assembly.requests) == before
+
+
+@pytest.mark.parametrize("assembly", [([i for i in range(1, 251) if i != 42], None)], indirect=True)
+def test_sync_appends_in_order_and_resumes(assembly, tmp_path):
+    csv_path = tmp_path / "dataset_scrutins_14.csv"
+    summary = sync(14, str(csv_path), fetcher=make_fetcher(assembly), workers=4, commit_every=30)
+    assert summary['new'] == 249 and summary['failed'] == [] and summary['last_id'] == 250
+    assert summary['updated'] == [i for i in range(1, 251) if i != 42]
+    ids = pd.read_csv(csv_path)['scrutin_id'].drop_duplicates().tolist()
+    assert ids == [i for i in range(1, 251) if i != 42]
+
+    # Nouveaux scrutins publiés : seuls ceux-ci sont demandés
+    assembly.ids.update(range(251, 261))
+    assembly.requests.clear()
+    summary = sync(14, str(csv_path), fetcher=make_fetcher(assembly), workers=4)
+    assert summary['new'] == 10 and summary['last_id'] == 260
+    assert summary['updated'] == list(range(251, 261))
+    assert min(assembly.requests) == 251
+    assert pd.read_csv(csv_path)['scrutin_id'].nunique() == 259
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 31), {10: 100, 11: 100})], indirect=True)
+def test_sync_retries_failed_scrutins(assembly, tmp_path):
+    csv_path = tmp_path / "dataset_scrutins_14.csv"
+    summary = sync(14, str(csv_path), fetcher=make_fetcher(assembly, max_retries=1), workers=4)
+    assert summary['failed'] == [10, 11] and summary['last_id'] == 30
+    with open(tmp_path / "dataset_scrutins_14.sync.json", encoding='utf-8') as f:
+        assert json.load(f)['failed'] == [10, 11]
+    assert set(pd.read_csv(csv_path)['scrutin_id']) == set(range(1, 31)) - {10, 11}
+
+    # Le serveur est rétabli : les scrutins en échec sont téléchargés à la synchronisation suivante
+    assembly.flaky.clear()
+    summary = sync(14, str(csv_path), fetcher=make_fetcher(assembly), workers=4)
+    assert summary == {'new': 2, 'changed': 0, 'failed': [], 'last_id': 30, 'updated': [10, 11]}
+    assert set(pd.read_csv(csv_path)['scrutin_id']) == set(range(1, 31))
+
+
+@pytest.mark.parametrize("assembly", [(range(1, 21), None)], indirect=True)
+def test_sync_recheck_rewrite_survives_interruption(assembly, tmp_path, monkeypatch):
+    csv_path = tmp_path / "dataset_scrutins_14.csv"
+    state_path = tmp_path / "dataset_scrutins_14.sync.json"
+    sync(14, str(csv_path), fetcher=make_fetcher(assembly))
+
+    # Empreinte périmée : le scrutin 19 passe pour modifié à la re-vérification
+    state = json.loads(state_path.read_text(encoding='utf-8'))
+    state['scrutins']['19'] = {'sha1': 'perime', 'etag': None}
+    state_path.write_text(json.dumps(state), encoding='utf-8')
+
+    # Interruption entre l'écriture de l'état et le remplacement du CSV
+    import src.fetcher as fetcher_module
+    real_replace = fetcher_module.os.replace
+
+    def crash(src, dst):
+        if str(dst) == str(csv_path):
+            raise KeyboardInterrupt
+        real_replace(src, dst)
+
+    monkeypatch.setattr(fetcher_module.os, 'replace', crash)
+    with pytest.raises(KeyboardInterrupt):
+        sync(14, str(csv_path), fetcher=make_fetcher(assembly), recheck_last=3)
+    monkeypatch.setattr(fetcher_module.os, 'replace', real_replace)
+
+    summary = sync(14, str(csv_path), fetcher=make_fetcher(assembly), recheck_last=3)
+    assert summary['changed'] == 0 and summary['last_id'] == 20
+    df = pd.read_csv(csv_path)
+    assert len(df) == 40 and sorted(df['scrutin_id'].unique()) == list(range(1, 21))
+    assert json.loads(state_path.read_text(encoding='utf-8'))['scrutins']['19']['sha1'] != 'perime'